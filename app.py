@@ -1,19 +1,83 @@
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, request, jsonify, send_file, render_template, Response, stream_with_context
 import pandas as pd
 import os
 import uuid
+import json
 from scrapers.hpd_scraper import HPDScraper
 from scrapers.bisweb_scraper import BISWEBScraper
 from scrapers.dobnow_scraper import DOBNOWScraper
 from scrapers.bisweb_property_scraper import BISWEBPropertyScraper
+from scrapers.base_scraper import BaseScraper
+from scrapers.profile_cache import ProfileCache
+from scrapers.pipeline import ScrapePipeline
+from scrapers.driver_tracker import tracker
+from scrapers.circuit_breaker import breakers, CircuitOpenError
+from scrapers.metrics import metrics
+from scrapers.records import RecordStore, portfolio_analytics
+from scrapers.scheduler import Scheduler, INTERACTIVE, BATCH, PRIORITIES
+from scrapers.hedging import HedgePolicy
 
 app = Flask(__name__)
 
+# Optional persistent browser profile/cache, shared by all scrapers (one directory per pool slot)
+if os.environ.get('SCRAPER_PROFILE_DIR'):
+    BaseScraper.profile_cache = ProfileCache(
+        os.environ['SCRAPER_PROFILE_DIR'],
+        slots=int(os.environ.get('SCRAPER_PROFILE_SLOTS', 4)),
+        max_cache_mb=int(os.environ.get('SCRAPER_CACHE_MB', 512))
+    )
+
 # Initialize the scrapers
 hpd_scraper = HPDScraper()
 bisweb_scraper = BISWEBScraper()
 dobnow_scraper = DOBNOWScraper()
 bisweb_property_scraper = BISWEBPropertyScraper()
+# Browser slots shared by interactive and batch scrapes; some are held back for interactive requests
+scheduler = Scheduler(
+    capacity=int(os.environ.get('SCRAPER_CAPACITY', 4)),
+    reserved_interactive=int(os.environ.get('SCRAPER_RESERVED_INTERACTIVE', 1))
+)
+# Optional hedging of straggling interactive scrapes, e.g. SCRAPER_HEDGE_PERCENTILE=0.95
+hedge_policy = None
+if os.environ.get('SCRAPER_HEDGE_PERCENTILE'):
+    hedge_policy = HedgePolicy(
+        percentile=float(os.environ['SCRAPER_HEDGE_PERCENTILE']),
+        max_hedge_rate=float(os.environ.get('SCRAPER_HEDGE_MAX_RATE', 0.1))
+    )
+scrape_pipeline = ScrapePipeline(
+    warm_sessions=int(os.environ.get('SCRAPER_WARM_SESSIONS', 0)),
+    scheduler=scheduler,
+    hedge_policy=hedge_policy
+)
+# Typed records of every building scraped by this server, for portfolio analytics
+portfolio_store = RecordStore()
+
+
+def _record_id(hpd_building_id, borough, block, lot):
+    """Identify a building the same way the batch CLI does: HPD id and/or borough/block/lot"""
+    parts = []
+    if hpd_building_id:
+        parts.append(str(hpd_building_id).strip())
+    if borough and block and lot:
+        parts.append(f"{borough}/{block}/{lot}")
+    return " ".join(parts)
+
+
+def _write_csv(all_data):
+    """Write the merged building data to a CSV in downloads/ and return its filename"""
+    # Generate unique filename
+    filename = f"building_data_{uuid.uuid4().hex[:8]}.csv"
+    filepath = os.path.join('downloads', filename)
+
+    # Ensure downloads directory exists
+    os.makedirs('downloads', exist_ok=True)
+
+    # Create CSV file; nested per-BIN records become their own columns and
+    # per-violation detail lists are left to the JSON response
+    flat_data = {key: value for key, value in all_data.items() if not isinstance(value, list)}
+    df = pd.json_normalize([flat_data], sep=' / ')
+    df.to_csv(filepath, index=False)
+    return filename
 
 @app.route('/')
 def index():
@@ -24,82 +88,232 @@ def index():
 def scrape_data():
     """API endpoint to scrape building data"""
     print("dih")
-    try:
-        data = request.get_json()
-        bisweb_borough = data.get('bisweb_borough')
-        bisweb_block = data.get('bisweb_block')
-        bisweb_lot = data.get('bisweb_lot')
-        hpd_building_id = data.get('hpd_building_id')
-        bisweb_url = data.get('bisweb_url')  # Legacy support
-        dobnow_url = data.get('dobnow_url')
-        bisweb_property_url = data.get('bisweb_property_url')
-        has_bisweb = (bisweb_borough and bisweb_block and bisweb_lot) or bisweb_url
-        if not has_bisweb and not dobnow_url and not bisweb_property_url and not hpd_building_id:
-            return jsonify({'error': 'At least one input is required: HPD Building ID, BISWEB Building (borough, block, lot), DOBNOW URL, or BISWEB Property URL'}), 400
+    # Validated before taking a browser slot, so a bad request is refused without queueing
+    data = request.get_json() or {}
+    bisweb_borough = data.get('bisweb_borough')
+    bisweb_block = data.get('bisweb_block')
+    bisweb_lot = data.get('bisweb_lot')
+    hpd_building_id = data.get('hpd_building_id')
+    bisweb_url = data.get('bisweb_url')  # Legacy support
+    dobnow_url = data.get('dobnow_url')
+    bisweb_property_url = data.get('bisweb_property_url')
+    has_bisweb = (bisweb_borough and bisweb_block and bisweb_lot) or bisweb_url
+    if not has_bisweb and not dobnow_url and not bisweb_property_url and not hpd_building_id:
+        return jsonify({'error': 'At least one input is required: HPD Building ID, BISWEB Building (borough, block, lot), DOBNOW URL, or BISWEB Property URL'}), 400
+
+    # Any driver still alive when the request ends is killed by the tracker
+    with scheduler.slot(INTERACTIVE), tracker.scope('request') as scope:
+        try:
+            all_data = {}
+            # Sources skipped (circuit open, or no BIN for DOBNOW) and sources that failed, with the reason
+            skipped = {}
+            errors = {}
+            # Scrape HPD data if building id provided
+            print("checking HPD...")
+            if hpd_building_id:
+                print(f"🔍 Scraping HPD data for building id: {hpd_building_id}")
+                hpd_input = str(hpd_building_id).strip()
+                if hpd_input:
+                    try:
+                        print(f"🔍 Scraping HPD data for building id: {hpd_input}")
+                        hpd_data = breakers.call('HPD', hpd_scraper.scrape_building_data, hpd_input)
+                        for key, value in hpd_data.items():
+                            all_data[key] = value
+                    except CircuitOpenError as e:
+                        skipped['HPD'] = str(e)
+                    except Exception as e:
+                        print(f"  ⚠️ Error scraping HPD: {e}")
+                        errors['HPD'] = str(e)
+                # DOBNOW is searched by the BIN HPD gives us
+                if all_data.get('BIN'):
+                    print("scraping dobnow")
+                    try:
+                        dobnow_data = breakers.call('DOBNOW', dobnow_scraper.scrape_building_data, all_data['BIN'])
+                        # Prefix DOBNOW data keys to distinguish them
+                        for key, value in dobnow_data.items():
+                            all_data[key] = value
+                    except CircuitOpenError as e:
+                        skipped['DOBNOW'] = str(e)
+                    except Exception as e:
+                        print(f"  ⚠️ Error scraping DOBNOW: {e}")
+                        errors['DOBNOW'] = str(e)
+                else:
+                    skipped['DOBNOW'] = 'No BIN available from HPD'
+
         
-        all_data = {}
-        # Scrape HPD data if building id provided
-        print("checking HPD...")
-        if hpd_building_id:
-            print(f"🔍 Scraping HPD data for building id: {hpd_building_id}")
-            hpd_input = str(hpd_building_id).strip()
-            if hpd_input:
+            # Scrape BISWEB data if borough/block/lot or URL provided
+            if bisweb_borough and bisweb_block and bisweb_lot:
+                print(f"🔍 Scraping BISWEB data with Borough={bisweb_borough}, Block={bisweb_block}, Lot={bisweb_lot}")
                 try:
-                    print(f"🔍 Scraping HPD data for building id: {hpd_input}")
-                    hpd_data = hpd_scraper.scrape_building_data(hpd_input)
-                    for key, value in hpd_data.items():
+                    bisweb_data = breakers.call(
+                        'BISWEB', bisweb_scraper.scrape_building_data,
+                        borough=bisweb_borough,
+                        block=bisweb_block,
+                        lot=bisweb_lot
+                    )
+                    # Prefix BISWEB data keys to distinguish them
+                    for key, value in bisweb_data.items():
                         all_data[key] = value
+                except CircuitOpenError as e:
+                    skipped['BISWEB'] = str(e)
                 except Exception as e:
-                    print(f"  ⚠️ Error scraping HPD: {e}")
-            print("scraping dobnow")
-            dobnow_data = dobnow_scraper.scrape_building_data(all_data['BIN'])
-            # Prefix DOBNOW data keys to distinguish them
-            for key, value in dobnow_data.items():
-                all_data[key] = value
-
+                    print(f"  ⚠️ Error scraping BISWEB: {e}")
+                    errors['BISWEB'] = str(e)
+                try:
+                    print(f"🔍 Scraping BISWEB Property Profile with Borough={bisweb_borough}, Block={bisweb_block}, Lot={bisweb_lot}")
+                    bisweb_property_data = breakers.call(
+                        'BISWEB Property', bisweb_property_scraper.scrape_building_data,
+                        borough=bisweb_borough,
+                        block=bisweb_block,
+                        lot=bisweb_lot
+                    )
+                    for key, value in bisweb_property_data.items():
+                        all_data[key] = value
+                except CircuitOpenError as e:
+                    skipped['BISWEB Property'] = str(e)
+                except Exception as e:
+                    print(f"  ⚠️ Error scraping BISWEB Property Profile: {e}")
+                    errors['BISWEB Property'] = str(e)
+            filename = _write_csv(all_data)
+            portfolio_store.add(all_data, _record_id(hpd_building_id, bisweb_borough, bisweb_block, bisweb_lot))
+        
+            return jsonify({
+                'success': True,
+                'data': all_data,
+                'download_url': f'/download/{filename}',
+                'resources': scope.usage(),
+                'skipped': skipped,
+                'errors': errors,
+                'circuits': breakers.status()
+            })
         
-        # Scrape BISWEB data if borough/block/lot or URL provided
-        if bisweb_borough and bisweb_block and bisweb_lot:
-            print(f"🔍 Scraping BISWEB data with Borough={bisweb_borough}, Block={bisweb_block}, Lot={bisweb_lot}")
-            bisweb_data = bisweb_scraper.scrape_building_data(
-                borough=bisweb_borough,
-                block=bisweb_block,
-                lot=bisweb_lot
-            )
-            # Prefix BISWEB data keys to distinguish them
-            for key, value in bisweb_data.items():
-                all_data[key] = value
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+@app.route('/scrape/stream', methods=['POST'])
+def scrape_data_stream():
+    """Streaming variant of /scrape: one NDJSON line per source as it finishes, then a summary line"""
+    data = request.get_json()
+    hpd_building_id = data.get('hpd_building_id')
+    bisweb_borough = data.get('bisweb_borough')
+    bisweb_block = data.get('bisweb_block')
+    bisweb_lot = data.get('bisweb_lot')
+    violation_details = bool(data.get('bisweb_violation_details'))
+    priority = data.get('priority', INTERACTIVE)
+    if priority not in PRIORITIES:
+        return jsonify({'error': f'priority must be one of {", ".join(PRIORITIES)}'}), 400
+    has_bisweb = bisweb_borough and bisweb_block and bisweb_lot
+    if not has_bisweb and not hpd_building_id:
+        return jsonify({'error': 'At least one input is required: HPD Building ID or BISWEB Building (borough, block, lot)'}), 400
+
+    def generate():
+        for event in scrape_pipeline.iter_events(
+            hpd_building_id=hpd_building_id,
+            borough=bisweb_borough,
+            block=bisweb_block,
+            lot=bisweb_lot,
+            violation_details=violation_details,
+            priority=priority
+        ):
+            if event['event'] == 'summary':
+                portfolio_store.add(event['data'], _record_id(hpd_building_id, bisweb_borough, bisweb_block, bisweb_lot))
+                try:
+                    filename = _write_csv(event['data'])
+                    event['download_url'] = f'/download/{filename}'
+                except Exception as e:
+                    event['error'] = str(e)
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/batch', methods=['POST'])
+def scrape_batch():
+    """Scrape many buildings at batch priority, streaming one NDJSON line per building as it finishes.
+
+    Body: {"buildings": [{"hpd_building_id": ..., "bisweb_borough": ..., "bisweb_block": ..., "bisweb_lot": ...}, ...]}
+    """
+    data = request.get_json() or {}
+    buildings = data.get('buildings') or []
+    if not buildings:
+        return jsonify({'error': 'buildings must be a non-empty list'}), 400
+    try:
+        # Through str() so that floats like 2.5 and booleans are refused rather than truncated
+        concurrency = int(str(data.get('concurrency', 4)))
+    except ValueError:
+        concurrency = 0
+    if concurrency < 1:
+        return jsonify({'error': 'concurrency must be a positive integer'}), 400
+    batch_jobs = [
+        {
+            'hpd_building_id': building.get('hpd_building_id'),
+            'borough': building.get('bisweb_borough'),
+            'block': building.get('bisweb_block'),
+            'lot': building.get('bisweb_lot'),
+            'violation_details': bool(building.get('bisweb_violation_details')),
+        }
+        for building in buildings
+    ]
+
+    def generate():
+        for index, summary in scrape_pipeline.iter_batch(batch_jobs, concurrency=concurrency, priority=BATCH):
+            building = batch_jobs[index]
+            record_id = _record_id(building['hpd_building_id'], building['borough'], building['block'], building['lot'])
+            portfolio_store.add(summary['data'], record_id)
+            yield json.dumps({'index': index, 'id': record_id, **summary}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/hpd/<building_id>/violations')
+def hpd_violations_stream(building_id):
+    """Stream a building's individual HPD violations as NDJSON, one line per violation, then a summary line"""
+    open_only = request.args.get('all') != '1'
+
+    def generate():
+        count = 0
+        # The walk drives a Chrome browser for as long as pages keep coming, so it holds a slot like any scrape
+        with scheduler.slot(INTERACTIVE), tracker.scope('HPD Violations') as scope:
             try:
-                print(f"🔍 Scraping BISWEB Property Profile with Borough={bisweb_borough}, Block={bisweb_block}, Lot={bisweb_lot}")
-                bisweb_property_data = bisweb_property_scraper.scrape_building_data(
-                    borough=bisweb_borough,
-                    block=bisweb_block,
-                    lot=bisweb_lot
-                )
-                for key, value in bisweb_property_data.items():
-                    all_data[key] = value
+                for violation in hpd_scraper.iter_violations(building_id, open_only=open_only):
+                    count += 1
+                    yield json.dumps({'event': 'violation', **violation.to_dict()}) + '\n'
             except Exception as e:
-                print(f"  ⚠️ Error scraping BISWEB Property Profile: {e}")
-        # Generate unique filename
-        filename = f"building_data_{uuid.uuid4().hex[:8]}.csv"
-        filepath = os.path.join('downloads', filename)
-        
-        # Ensure downloads directory exists
-        os.makedirs('downloads', exist_ok=True)
-        
-        # Create CSV file
-        df = pd.DataFrame([all_data])
-        df.to_csv(filepath, index=False)
-        
-        return jsonify({
-            'success': True,
-            'data': all_data,
-            'download_url': f'/download/{filename}'
-        })
-        
+                yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+        yield json.dumps({'event': 'summary', 'count': count, 'resources': scope.usage()}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/portfolio/analytics', methods=['GET', 'POST'])
+def portfolio_analytics_endpoint():
+    """Totals, distributions and rankings over the buildings scraped so far.
+
+    POST {"records": [...]} to analyze a portfolio instead, e.g. the batch CLI's
+    NDJSON output: each record is either {"id": ..., "data": {...}} or a raw field dict.
+    """
+    try:
+        top = int(request.args.get('top', 10))
+        if request.method == 'POST':
+            store = RecordStore()
+            for index, record in enumerate((request.get_json() or {}).get('records', [])):
+                if 'data' in record:
+                    store.add(record['data'], str(record.get('id', index)))
+                else:
+                    store.add(record, str(index))
+        else:
+            store = portfolio_store
+        frame = store.frame()
+        return jsonify(portfolio_analytics(frame, top=top))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+def get_metrics():
+    """Scrape counters/timings and resource figures for every live browser"""
+    snapshot = metrics.snapshot()
+    snapshot['drivers'] = tracker.stats()
+    snapshot['scheduler'] = scheduler.stats()
+    snapshot['circuits'] = breakers.status()
+    return jsonify(snapshot)
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """Serve CSV file for download"""
@@ -1,68 +1,246 @@
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
-
-driver = webdriver.Chrome()
-wait = WebDriverWait(driver, 10) 
-
-driver.get("https://hpdonline.nyc.gov/hpdonline/building/314419/overview")
-wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.p-card-content")))
-time.sleep(2)
-
-# Scrape data
-violations = {
-    "A": int(driver.find_element(By.XPATH, "//span[contains(normalize-space(.),'A Class')]/span[@class='fw-bold']").text),
-    "B": int(driver.find_element(By.XPATH, "//span[contains(normalize-space(.),'B Class')]/span[@class='fw-bold']").text),
-    "C": int(driver.find_element(By.XPATH, "//span[contains(normalize-space(.),'C Class')]/span[@class='fw-bold']").text),
-    "I": int(driver.find_element(By.XPATH, "//span[contains(normalize-space(.),'I Class')]/span[@class='fw-bold']").text),
-}
-
-stories = driver.find_element(
-    By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='STOREYS']]//div[contains(@class,'card-content-botttom')]"
-).text.strip()
-
-a_units = driver.find_element(
-    By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='A UNITS']]//div[contains(@class,'card-content-botttom')]"
-).text.strip()
-
-b_units = driver.find_element(
-    By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='B UNITS']]//div[contains(@class,'card-content-botttom')]"
-).text.strip()
-
-litigation_number = driver.find_element(
-    By.CSS_SELECTOR, "span.fs-base > span.fw-bold"
-).text.strip()
-
-aep_status = driver.find_element(
-    By.XPATH,
-    "//span[text()='Alternate Enforcement Program (AEP)']/../../../../div[contains(@class,'content-right')]//span"
-).text.strip()
-
-conh_status = driver.find_element(
-    By.XPATH,
-    "//span[text()='Certification of No Harassment Pilot Program']/../../../../div[contains(@class,'content-right')]//span"
-).text.strip()
-
-driver.quit()
-
-# Combine all data into a dictionary for pandas
-data = {
-    "Stories": stories,
-    "A Units": a_units,
-    "B Units": b_units,
-    "Litigation": litigation_number,
-    "AEP Status": aep_status,
-    "CONH Status": conh_status,
-    "A Violations": violations["A"],
-    "B Violations": violations["B"],
-    "C Violations": violations["C"],
-    "I Violations": violations["I"],
-}
-
-# Create a DataFrame and export to CSV
-df = pd.DataFrame([data])
-df.to_csv("building_data.csv", index=False)
-print("Data saved to building_data.csv")
\ No newline at end of file
+"""Headless batch scraper over the scrapers package.
+
+Reads one building per line from a file (or stdin) and writes one JSON line
+per building to stdout (or a file) as soon as that building finishes.
+
+Each line holds an HPD building id, a borough/block/lot, or both:
+
+    314419
+    1/00023/7501
+    314419 1/00023/7501
+
+Use --shard i/n to split one portfolio across several machines: every
+machine gets the same input and keeps only the buildings whose identifier
+hashes to its shard (i is 0-based).
+
+    python realestatescraping.py portfolio.txt --workers 4 --shard 0/3 -o part0.ndjson
+
+With --violations, each HPD building's individual open violations are
+streamed instead, one JSON line per violation as each listing page is read.
+
+With --engine cdp, buildings are scraped by the asyncio DevTools engine: one
+headless Chrome with up to --tabs isolated tabs open at once, instead of a
+Selenium browser per source scrape. Raise --workers with it, e.g.
+
+    python realestatescraping.py portfolio.txt --engine cdp --workers 16 --tabs 32
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
+import argparse
+import asyncio
+import json
+import re
+import sys
+import threading
+import zlib
+from scrapers.base_scraper import BaseScraper
+from scrapers.cdp_engine import CDPEngine
+from scrapers.hpd_scraper import HPDScraper
+from scrapers.pipeline import ScrapePipeline
+from scrapers.profile_cache import ProfileCache
+from scrapers.scheduler import Scheduler, BATCH
+
+
+def parse_identifier(line):
+    """Parse an input line into (hpd_building_id, borough, block, lot); missing parts are None"""
+    hpd_building_id = None
+    borough = block = lot = None
+    for token in line.split():
+        if token.isdigit():
+            hpd_building_id = token
+            continue
+        parts = re.split(r"[/,\-]", token)
+        if len(parts) == 3 and all(p.isdigit() for p in parts):
+            borough, block, lot = parts
+        else:
+            raise ValueError(f"Unrecognized identifier: {token!r}")
+    return hpd_building_id, borough, block, lot
+
+
+def parse_shard(value):
+    """Parse an 'i/n' shard spec into (i, n)"""
+    try:
+        index, count = (int(p) for p in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/n, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {count}), got {value!r}")
+    return index, count
+
+
+def in_shard(identifier, shard):
+    """Deterministically assign an identifier to a shard (stable across machines and runs)"""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(identifier.encode("utf-8")) % count == index
+
+
+def read_identifiers(stream, shard=None):
+    """Yield the normalized, de-duplicated identifiers in this shard, skipping blanks and # comments"""
+    seen = set()
+    for line in stream:
+        identifier = " ".join(line.split("#", 1)[0].split())
+        if not identifier or identifier in seen:
+            continue
+        seen.add(identifier)
+        if in_shard(identifier, shard):
+            yield identifier
+
+
+def scrape_one(pipeline, identifier, violation_details=False):
+    """Scrape one building and return its output record"""
+    try:
+        hpd_building_id, borough, block, lot = parse_identifier(identifier)
+    except ValueError as e:
+        return {"id": identifier, "error": str(e)}
+
+    summary = pipeline.scrape(
+        priority=BATCH, hpd_building_id=hpd_building_id, borough=borough, block=block, lot=lot,
+        violation_details=violation_details
+    )
+    return building_record(identifier, summary)
+
+
+def building_record(identifier, summary):
+    """Output record for one building's scrape summary"""
+    return {
+        "id": identifier,
+        "data": summary.get("data", {}),
+        "sources": summary.get("sources", {}),
+        "errors": summary.get("errors", {}),
+        "elapsed": summary.get("elapsed"),
+    }
+
+
+async def scrape_all_cdp(identifiers, workers, tabs, headless, violation_details, on_record):
+    """Scrape buildings through one CDP-driven Chrome, up to `workers` buildings at a time"""
+    async with CDPEngine(max_tabs=tabs, headless=headless) as engine:
+        buildings = asyncio.Semaphore(workers)
+
+        async def scrape(identifier):
+            try:
+                hpd_building_id, borough, block, lot = parse_identifier(identifier)
+            except ValueError as e:
+                return {"id": identifier, "error": str(e)}
+            async with buildings:
+                summary = await engine.scrape(
+                    hpd_building_id=hpd_building_id, borough=borough, block=block, lot=lot,
+                    violation_details=violation_details
+                )
+            return building_record(identifier, summary)
+
+        tasks = [asyncio.create_task(scrape(identifier)) for identifier in identifiers]
+        print(f"🏢 {len(tasks)} buildings queued with {workers} workers and {tabs} tabs", file=sys.stderr)
+        for task in asyncio.as_completed(tasks):
+            on_record(await task, len(tasks))
+        print(f"  📊 Peak Chrome RSS: {engine.browser.peak_rss_mb:.0f} MB", file=sys.stderr)
+
+
+def stream_violations(scraper, identifier, write, include_closed=False):
+    """Write one line per HPD violation of a building as it is read; returns the summary record"""
+    try:
+        hpd_building_id = parse_identifier(identifier)[0]
+    except ValueError as e:
+        return {"id": identifier, "error": str(e)}
+    if not hpd_building_id:
+        return {"id": identifier, "error": "Violation mode needs an HPD building id"}
+
+    count = 0
+    try:
+        for violation in scraper.iter_violations(hpd_building_id, open_only=not include_closed):
+            write({"id": identifier, "violation": violation.to_dict()})
+            count += 1
+    except Exception as e:
+        return {"id": identifier, "violations": count, "error": str(e)}
+    return {"id": identifier, "violations": count}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape NYC building data for a list of buildings")
+    parser.add_argument("input", nargs="?", default="-", help="File with one building per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="Buildings scraped in parallel (default: 2)")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Only process shard i of n, e.g. 0/4")
+    parser.add_argument("--violations", action="store_true", help="Stream each HPD building's individual violations instead")
+    parser.add_argument("--include-closed", action="store_true", help="With --violations, include closed and dismissed violations")
+    parser.add_argument("--bisweb-violations", action="store_true", help="Also fetch the full BISWEB DOB and ECB violation tables over HTTP")
+    parser.add_argument("--warm-sessions", type=int, default=0, help="Resident search sessions per site for DOBNOW and the portal (default: off)")
+    parser.add_argument("--profile-dir", help="Keep persistent Chrome profiles and HTTP caches here between runs")
+    parser.add_argument("--cache-mb", type=int, default=512, help="Per-profile cache size limit in MB (default: 512)")
+    parser.add_argument("--headed", action="store_true", help="Show the Chrome windows instead of running headless")
+    parser.add_argument("--engine", choices=("selenium", "cdp"), default="selenium",
+                        help="selenium: a browser per source scrape; cdp: one browser, many tabs, asyncio (default: selenium)")
+    parser.add_argument("--tabs", type=int, default=16, help="With --engine cdp, tabs open at once (default: 16)")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.engine == "cdp" and args.violations:
+        parser.error("--violations needs the selenium engine")
+
+    BaseScraper.headless = not args.headed
+    if args.profile_dir:
+        # One profile slot per concurrent source scrape
+        BaseScraper.profile_cache = ProfileCache(args.profile_dir, slots=args.workers * 3, max_cache_mb=args.cache_mb)
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    # Each building fans out to up to three concurrent source scrapes
+    # Nothing interactive runs in the CLI, so no slots are held back for it
+    pipeline = ScrapePipeline(
+        max_workers=args.workers * 3,
+        warm_sessions=args.warm_sessions,
+        scheduler=Scheduler(capacity=args.workers * 3, reserved_interactive=0)
+    )
+
+    write_lock = threading.Lock()
+
+    def write(record):
+        with write_lock:
+            outfile.write(json.dumps(record) + "\n")
+            outfile.flush()
+
+    hpd_scraper = HPDScraper()
+
+    def run(identifier):
+        if args.violations:
+            return stream_violations(hpd_scraper, identifier, write, args.include_closed)
+        return scrape_one(pipeline, identifier, args.bisweb_violations)
+
+    done = failed = 0
+
+    def finish(record, total):
+        nonlocal done, failed
+        write(record)
+        done += 1
+        if record.get("error") or record.get("errors"):
+            failed += 1
+        print(f"  📊 [{done}/{total}] {record['id']}", file=sys.stderr)
+
+    try:
+        # Scraper progress goes to stderr so stdout carries only NDJSON records
+        with infile, redirect_stdout(sys.stderr):
+            identifiers = list(read_identifiers(infile, args.shard))
+            if args.engine == "cdp":
+                asyncio.run(scrape_all_cdp(
+                    identifiers, args.workers, args.tabs, not args.headed, args.bisweb_violations, finish
+                ))
+            else:
+                with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                    futures = [executor.submit(run, identifier) for identifier in identifiers]
+                    print(f"🏢 {len(futures)} buildings queued with {args.workers} workers", file=sys.stderr)
+                    for future in as_completed(futures):
+                        finish(future.result(), len(futures))
+    finally:
+        for scraper in (pipeline.dobnow_scraper, pipeline.bisweb_scraper):
+            if scraper.warm_sessions:
+                scraper.warm_sessions.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    print(f"✅ Finished {done} buildings ({failed} with errors)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
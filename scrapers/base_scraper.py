@@ -6,12 +6,35 @@ from selenium.webdriver.chrome.options import Options
 from abc import ABC, abstractmethod
 import time
 import traceback
+from .driver_tracker import tracker
+
+
+def locator(selector):
+    """Selenium locator for a selector string: XPath if it starts with / or (, CSS otherwise (as in the CDP engine)"""
+    if selector.startswith(("/", "(")):
+        return By.XPATH, selector
+    return By.CSS_SELECTOR, selector
 
 
 class BaseScraper(ABC):
     """Base class for all scrapers with common functionality"""
     
-    def __init__(self):
+    # Run Chrome without a visible window (set by the batch CLI)
+    headless = False
+    
+    # Optional ProfileCache shared by every scraper: persistent profile and HTTP cache per pool slot
+    profile_cache = None
+    
+    # WarmSessionPool serving lookups; only scrapers with WarmSearchMixin can have one
+    warm_sessions = None
+    
+    def enable_warm_sessions(self, size=2, **session_options):
+        """Overridden by WarmSearchMixin; other scrapers have no search form to keep warm"""
+        raise TypeError(f"{self.__class__.__name__} does not support warm sessions")
+    
+    @abstractmethod
+    async def scrape_page(self, page, *args):
+        """Scrape one building in a CDP engine tab (a CDPPage); returns the same fields as scrape_building_data"""
         pass
     
     def get_element_text(self, element):
@@ -20,12 +43,17 @@ class BaseScraper(ABC):
         text = element.text or element.get_attribute('textContent') or element.get_attribute('innerText')
         return text.strip() if text else ""
     
-    def _setup_driver(self):
-        """Setup Chrome driver with proper configuration"""
+    def _setup_driver(self, resident=False):
+        """Setup Chrome driver with proper configuration.
+
+        The driver is registered with the shared tracker so its resources are
+        sampled and it is force-killed if it leaks. Release it with _quit_driver.
+        """
         chrome_options = Options()
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
-        # chrome_options.add_argument("--headless")
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--window-size=1920,1080")  # Set window size to ensure content loads
         chrome_options.add_argument("--start-maximized")  # Start maximized
         chrome_options.add_argument("--disable-web-security")  # Disable web security for better compatibility
@@ -34,8 +62,20 @@ class BaseScraper(ABC):
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option("useAutomationExtension", False)
 
+        # Reuse a persistent profile so the sites' JS/CSS bundles come from the disk cache
+        slot = self.profile_cache.acquire() if self.profile_cache else None
+        if slot is not None:
+            for argument in self.profile_cache.chrome_arguments(slot):
+                chrome_options.add_argument(argument)
         
-        driver = webdriver.Chrome(options=chrome_options)
+        try:
+            driver = webdriver.Chrome(options=chrome_options)
+        except Exception:
+            if slot is not None:
+                self.profile_cache.release(slot)
+            raise
+        on_close = (lambda: self.profile_cache.release(slot)) if slot is not None else None
+        tracker.register(driver, resident=resident, on_close=on_close)
         wait = WebDriverWait(driver, 10)
         driver.execute_cdp_cmd(
             "Page.addScriptToEvaluateOnNewDocument",
@@ -54,6 +94,10 @@ class BaseScraper(ABC):
         
         return driver, wait
     
+    def _quit_driver(self, driver):
+        """Quit a driver created by _setup_driver and stop tracking it"""
+        tracker.release(driver)
+    
     @abstractmethod
     def _scrape_data(self, driver, wait):
         """Abstract method to be implemented by subclasses for specific scraping logic"""
@@ -78,5 +122,5 @@ class BaseScraper(ABC):
             scraper_name = self.__class__.__name__
             raise Exception(f"Error scraping {scraper_name} data: {str(e)}\nFull traceback: {error_details}")
         finally:
-            driver.quit()
+            self._quit_driver(driver)
 
@@ -1,13 +1,46 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+import asyncio
+import re
 import time
 from .base_scraper import BaseScraper
 
 
+def parse_additional_bins(bins_text):
+    """Parse the flattened "Additional BINs" text into a list of 7-digit BINs (empty for NONE)"""
+    if not bins_text:
+        return []
+    # A BIN is 7 digits starting with the borough code; keep first-seen order and drop repeats
+    return list(dict.fromkeys(re.findall(r"\b[1-5]\d{6}\b", bins_text)))
+
+
+def lot_bins(property_data):
+    """Every BIN of a lot from its property profile: the profile's own BIN first, then the Additional BINs"""
+    return parse_additional_bins(
+        " ".join(filter(None, (property_data.get("Property BIN"), property_data.get("Additional BINs"))))
+    )
+
+
 class BISWEBPropertyScraper(BaseScraper):
     """Scraper for BISWEB Property Profile Overview page to extract landmark status, additional BINs, and violations"""
     
+    PROFILE_URL = (
+        "https://a810-bisweb.nyc.gov/bisweb/PropertyProfileOverviewServlet?"
+        "boro={borough}&block={block}&lot={lot}&go3=+GO+&requestid=0"
+    )
+    
+    # Innermost cell of the profile header holding "BIN# 1234567", the BIN the profile is for
+    BIN_XPATH = "//td[contains(., 'BIN#')][not(.//td)]"
+    
+    # Profile table rows read by this scraper; their values are in the row's td.content cells
+    ROW_XPATHS = {
+        "Landmark Status": "//tr[td[@class='content' and contains(., 'Landmark Status:')]]",
+        "Additional BINs": "//tr[td[@class='content' and contains(., 'Additional BINs for Building:')]]",
+        "DOB Violations": "//tr[td[@class='content']//a[contains(@href, 'ActionsByLocationServlet') and contains(., 'Violations-DOB')]]",
+        "ECB Violations": "//tr[td[@class='content']//a[contains(@href, 'ECBQueryByLocationServlet') and contains(., 'Violations-OATH/ECB')]]",
+    }
+    
     def scrape_building_data(self, borough=None, block=None, lot=None, url=None):
         """Main entry: navigate by borough/block/lot form or by URL, then scrape."""
         driver, _ = self._setup_driver()
@@ -15,10 +48,7 @@ class BISWEBPropertyScraper(BaseScraper):
         try:
             if borough and block and lot:
                 print("🌐 Navigating to BISWEB Property Info portal (by BBL)...")
-                driver.get(
-                    f"https://a810-bisweb.nyc.gov/bisweb/PropertyProfileOverviewServlet?"
-                    f"boro={borough}&block={block}&lot={lot}&go3=+GO+&requestid={0}"
-                )
+                driver.get(self.PROFILE_URL.format(borough=borough, block=block, lot=lot))
             elif url:
                 print(f"🌐 Navigating to URL: {url}")
                 driver.get(url)
@@ -36,7 +66,7 @@ class BISWEBPropertyScraper(BaseScraper):
             scraper_name = self.__class__.__name__
             raise Exception(f"Error scraping {scraper_name} data: {str(e)}\nFull traceback: {error_details}")
         finally:
-            driver.quit()
+            self._quit_driver(driver)
 
     def _scrape_data(self, driver, wait):
         """Scrape building data from BISWEB Property Profile Overview page"""
@@ -49,112 +79,68 @@ class BISWEBPropertyScraper(BaseScraper):
         # Wait a bit more for dynamic content to start loading
         time.sleep(2)
         
+        rows = {"BIN": [self.get_element_text(cell) for cell in driver.find_elements(By.XPATH, self.BIN_XPATH)]}
+        for name, xpath in self.ROW_XPATHS.items():
+            try:
+                print(f"  ⏳ Looking for {name} row...")
+                row = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+                rows[name] = [self.get_element_text(cell) for cell in row.find_elements(By.CSS_SELECTOR, "td.content")]
+            except Exception as e:
+                print(f"  ⚠️ Error extracting {name}: {str(e)}")
+        
+        return self._fields_from_rows(rows)
+
+    async def scrape_page(self, page, borough, block, lot):
+        """CDP-engine counterpart of scrape_building_data: the same profile rows, read in a tab"""
+        print(f"🌐 [cdp] Navigating to BISWEB Property Profile for Borough={borough}, Block={block}, Lot={lot}")
+        await page.goto(self.PROFILE_URL.format(borough=borough, block=block, lot=lot))
+        await asyncio.sleep(2)
+        rows = {"BIN": await page.texts(self.BIN_XPATH)}
+        for name, xpath in self.ROW_XPATHS.items():
+            try:
+                await page.wait_for_selector(xpath)
+                rows[name] = await page.texts(xpath, within="td.content")
+            except Exception as e:
+                print(f"  ⚠️ Error extracting {name}: {str(e)}")
+        return self._fields_from_rows(rows)
+
+    def _fields_from_rows(self, rows):
+        """Turn the cell texts of each profile row into output fields"""
         building_data = {}
         
-        # Scrape Landmark Status
-        try:
-            print("  ⏳ Looking for Landmark Status row...")
-            # Find the row containing "Landmark Status:"
-            landmark_row = wait.until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//tr[td[@class='content' and contains(., 'Landmark Status:')]]")
-                )
-            )
-            
-            # Get all cells in this row
-            cells = landmark_row.find_elements(By.CSS_SELECTOR, "td.content")
-            
-            # The landmark status value should be in the second cell (index 1)
-            if len(cells) >= 2:
-                landmark_status = self.get_element_text(cells[1])
-                if landmark_status:
-                    building_data["Landmark Status"] = landmark_status
-                    print(f"  📊 Landmark Status: {landmark_status}")
-        except Exception as e:
-            print(f"  ⚠️ Error extracting Landmark Status: {str(e)}")
+        # Kept apart from HPD's "BIN" so a mismatch between the two sites is visible
+        for text in rows.get("BIN", []):
+            match = re.search(r"BIN#\s*([1-5]\d{6})", text)
+            if match:
+                building_data["Property BIN"] = match.group(1)
+                print(f"  📊 Property BIN: {match.group(1)}")
+                break
         
-        # Scrape Additional BINs
-        try:
-            print("  ⏳ Looking for Additional BINs row...")
-            # Find the row containing "Additional BINs for Building:"
-            bins_row = wait.until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//tr[td[@class='content' and contains(., 'Additional BINs for Building:')]]")
-                )
-            )
-            
-            # Get all cells in this row
-            cells = bins_row.find_elements(By.CSS_SELECTOR, "td.content")
-            
-            # The additional BINs value should be in the second cell (index 1)
-            if len(cells) >= 2:
-                bins_text = self.get_element_text(cells[1])
-                
-                # Clean up the text - remove any extra whitespace and newlines
-                bins_text = ' '.join(bins_text.split())
-                
-                if bins_text and bins_text.upper() != "NONE":
-                    building_data["Additional BINs"] = bins_text
-                    print(f"  📊 Additional BINs: {bins_text}")
-                else:
-                    building_data["Additional BINs"] = "NONE"
-                    print("  📊 Additional BINs: NONE")
-        except Exception as e:
-            print(f"  ⚠️ Error extracting Additional BINs: {str(e)}")
+        # The value is in the second cell
+        cells = rows.get("Landmark Status", [])
+        if len(cells) >= 2 and cells[1]:
+            building_data["Landmark Status"] = cells[1]
+            print(f"  📊 Landmark Status: {cells[1]}")
         
-        # Scrape DOB Violations
-        try:
-            print("  ⏳ Looking for DOB Violations row...")
-            # Find the row containing "Violations-DOB" link
-            dob_violations_row = wait.until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//tr[td[@class='content']//a[contains(@href, 'ActionsByLocationServlet') and contains(., 'Violations-DOB')]]")
-                )
-            )
-            
-            # Get all cells in this row
-            cells = dob_violations_row.find_elements(By.CSS_SELECTOR, "td.content")
-            
-            # Second cell (index 1) is total, third cell (index 2) is open
-            if len(cells) >= 3:
-                total_dob = self.get_element_text(cells[1])
-                open_dob = self.get_element_text(cells[2])
-                
-                if total_dob:
-                    building_data["DOB Violations Total"] = total_dob
-                    print(f"  📊 DOB Violations Total: {total_dob}")
-                if open_dob:
-                    building_data["DOB Violations Open"] = open_dob
-                    print(f"  📊 DOB Violations Open: {open_dob}")
-        except Exception as e:
-            print(f"  ⚠️ Error extracting DOB Violations: {str(e)}")
+        cells = rows.get("Additional BINs", [])
+        if len(cells) >= 2:
+            # Clean up the text - remove any extra whitespace and newlines
+            bins_text = ' '.join(cells[1].split())
+            if bins_text and bins_text.upper() != "NONE":
+                building_data["Additional BINs"] = bins_text
+            else:
+                building_data["Additional BINs"] = "NONE"
+            print(f"  📊 Additional BINs: {building_data['Additional BINs']}")
         
-        # Scrape ECB Violations
-        try:
-            print("  ⏳ Looking for ECB Violations row...")
-            # Find the row containing "Violations-OATH/ECB" link
-            ecb_violations_row = wait.until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//tr[td[@class='content']//a[contains(@href, 'ECBQueryByLocationServlet') and contains(., 'Violations-OATH/ECB')]]")
-                )
-            )
-            
-            # Get all cells in this row
-            cells = ecb_violations_row.find_elements(By.CSS_SELECTOR, "td.content")
-            
-            # Second cell (index 1) is total, third cell (index 2) is open
+        # Second cell is the total, third is the open count
+        for name in ("DOB Violations", "ECB Violations"):
+            cells = rows.get(name, [])
             if len(cells) >= 3:
-                total_ecb = self.get_element_text(cells[1])
-                open_ecb = self.get_element_text(cells[2])
-                
-                if total_ecb:
-                    building_data["ECB Violations Total"] = total_ecb
-                    print(f"  📊 ECB Violations Total: {total_ecb}")
-                if open_ecb:
-                    building_data["ECB Violations Open"] = open_ecb
-                    print(f"  📊 ECB Violations Open: {open_ecb}")
-        except Exception as e:
-            print(f"  ⚠️ Error extracting ECB Violations: {str(e)}")
+                if cells[1]:
+                    building_data[f"{name} Total"] = cells[1]
+                    print(f"  📊 {name} Total: {cells[1]}")
+                if cells[2]:
+                    building_data[f"{name} Open"] = cells[2]
+                    print(f"  📊 {name} Open: {cells[2]}")
         
         return building_data
-
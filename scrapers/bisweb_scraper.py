@@ -1,63 +1,182 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+import asyncio
 import time
 from .base_scraper import BaseScraper
+from .warm_session import WarmSearchMixin
 
 
-class BISWEBScraper(BaseScraper):
+class BISWEBScraper(WarmSearchMixin, BaseScraper):
     """Scraper for BISWEB website to extract building data"""
     
+    PORTAL_URL = "https://propertyinformationportal.nyc.gov/"
+    BOROUGH_SELECT = "select[aria-label='Select borough']"
+    # The form has form-floating divs where input comes before label
+    BLOCK_INPUT_XPATH = "//div[contains(@class, 'form-floating')]//label[contains(text(), 'Block')]/preceding-sibling::input | //div[contains(@class, 'form-floating')]//input[following-sibling::label[contains(text(), 'Block')]] | //label[@for='block']/../input | //input[@id='block']"
+    LOT_INPUT_XPATH = "//div[contains(@class, 'form-floating')]//label[contains(text(), 'Lot')]/preceding-sibling::input | //div[contains(@class, 'form-floating')]//input[following-sibling::label[contains(text(), 'Lot')]] | //label[@for='lot']/../input | //input[@id='lot']"
+    SUBMIT_XPATH = "//button[@type='submit' and contains(text(), 'Search')]"
+    
+    # Building Information card: sections of label/value items
+    INFO_CARD_XPATH = "//div[contains(@class, 'card')]//p[contains(text(), 'Building Information')]/ancestor::div[contains(@class, 'card')]"
+    INFO_SECTION_CSS = ".sc-gFAWRd.evnkkT"
+    INFO_ITEM_CSS = ".sc-kdBSHD.gjouCV"
+    INFO_LABEL_CSS = "p.sc-cfxfcM.eyvGek"
+    INFO_VALUE_CSS = "p.sc-hRJfrW.jVlUZz"
+    INFO_LABELS = ["Residential Units", "Commercial Units", "Commercial Area", "Year Built", "Stories"]
+    
+    # Assessment table: FY, Building Class, Tax Class, Land Value, Improvement Value, Total Value, Change, Taxable Billable AV, Change
+    ASSESSMENT_HEADER_CSS = "thead.table-primary"
+    ASSESSMENT_COLUMNS = {"Building Class": 1, "Tax Class": 2, "Total Value": 5, "Taxable Billable AV": 7}
+    
+    def _open_search(self, driver, wait):
+        """Load the Property Information Portal home page with its search form"""
+        # Navigate to the portal and fill out the form
+        print("🌐 Navigating to Property Information Portal...")
+        driver.get(self.PORTAL_URL)
+        
+        # Wait for page to load
+        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        time.sleep(2)
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.BOROUGH_SELECT)))
+    
+    def _search_ready(self, driver):
+        """True when the borough/block/lot form is on screen"""
+        selects = driver.find_elements(By.CSS_SELECTOR, self.BOROUGH_SELECT)
+        return bool(selects) and selects[0].is_displayed()
+    
+    def _reset_search(self, driver, wait):
+        """Go back to the search form without reloading the portal's app bundle"""
+        driver.back()
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.BOROUGH_SELECT)))
+    
+    def _search(self, driver, wait, borough, block, lot):
+        """Fill and submit the borough/block/lot form, then scrape the parcel page"""
+        print(f"📝 Filling out form with Borough={borough}, Block={block}, Lot={lot}")
+        
+        # Find and select the borough dropdown
+        borough_select = wait.until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, self.BOROUGH_SELECT))
+        )
+        select = Select(borough_select)
+        select.select_by_value(str(borough))
+        print(f"  ✓ Selected borough: {borough}")
+        
+        # Find and fill the block input
+        # The form has form-floating divs where input comes before label
+        block_input = wait.until(
+            EC.presence_of_element_located((By.XPATH, self.BLOCK_INPUT_XPATH))
+        )
+        block_input.clear()
+        block_input.send_keys(str(block))
+        print(f"  ✓ Entered block: {block}")
+        
+        # Find and fill the lot input
+        lot_input = wait.until(
+            EC.presence_of_element_located((By.XPATH, self.LOT_INPUT_XPATH))
+        )
+        lot_input.clear()
+        lot_input.send_keys(str(lot))
+        print(f"  ✓ Entered lot: {lot}")
+        
+        # Find and click the submit button
+        submit_button = driver.find_element(By.XPATH, self.SUBMIT_XPATH)
+        submit_button.click()
+        print("  ✓ Submitted form")
+        
+        # Wait for navigation to the parcel page
+        time.sleep(3)
+        wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+        
+        return self._scrape_data(driver, wait)
+    
+    # Reads the Building Information card's label/value pairs in one round trip (CDP engine)
+    _READ_INFO_PAIRS_JS = """
+    if (!el) { return []; }
+    var pairs = [];
+    el.querySelectorAll(args[0]).forEach(function (section) {
+        section.querySelectorAll(args[1]).forEach(function (item) {
+            var label = item.querySelector(args[2]);
+            var value = item.querySelector(args[3]);
+            if (label && value) { pairs.push([text(label), text(value)]); }
+        });
+    });
+    return pairs;
+    """
+    
+    # First data row of the assessment table once it has all its cells (CDP engine)
+    _READ_ASSESSMENT_ROW_JS = """
+    if (!el) { return null; }
+    var table = el.parentElement;
+    var row = table.querySelector('tbody tr') || table.querySelectorAll('tr')[1];
+    if (!row) { return null; }
+    var cells = Array.from(row.querySelectorAll('td, th')).map(text);
+    return cells.length >= 8 ? cells : null;
+    """
+    
+    async def scrape_page(self, page, borough, block, lot):
+        """CDP-engine counterpart of scrape_building_data: fill the portal's form in a tab and read the parcel page"""
+        print(f"🌐 [cdp] Searching the Property Information Portal for Borough={borough}, Block={block}, Lot={lot}")
+        await page.goto(self.PORTAL_URL)
+        await page.wait_for_selector(self.BOROUGH_SELECT)
+        await page.select(self.BOROUGH_SELECT, str(borough))
+        await page.fill(self.BLOCK_INPUT_XPATH, str(block))
+        await page.fill(self.LOT_INPUT_XPATH, str(lot))
+        await page.click(self.SUBMIT_XPATH)
+        await asyncio.sleep(3)
+        await page.wait_for(lambda: page.evaluate("document.readyState === 'complete'"), description="parcel page")
+        await asyncio.sleep(2)
+
+        building_data = {}
+        try:
+            await page.wait_for_selector(self.INFO_CARD_XPATH, timeout=20, visible=True)
+            await asyncio.sleep(1)
+            pairs = await page.run(
+                self.INFO_CARD_XPATH, self._READ_INFO_PAIRS_JS,
+                self.INFO_SECTION_CSS, self.INFO_ITEM_CSS, self.INFO_LABEL_CSS, self.INFO_VALUE_CSS
+            )
+            for label, value in pairs:
+                if label and value and label in self.INFO_LABELS:
+                    building_data[label] = value
+                    print(f"  📊 {label}: {value}")
+        except Exception as e:
+            print(f"  ⚠️ Error extracting Building Information card data: {str(e)}")
+
+        try:
+            await page.wait_for_selector(self.INFO_VALUE_CSS, timeout=20, visible=True)
+            building_type = await page.text(self.INFO_VALUE_CSS)
+            if building_type:
+                building_data["Building Type"] = building_type
+                print(f"  📊 Building Type: {building_type}")
+        except Exception as e:
+            print(f"  ⚠️ Error extracting Building Type: {str(e)}")
+
+        try:
+            cells = await page.wait_for(
+                lambda: page.run(self.ASSESSMENT_HEADER_CSS, self._READ_ASSESSMENT_ROW_JS),
+                timeout=20, description="assessment table row"
+            )
+            for field, index in self.ASSESSMENT_COLUMNS.items():
+                if cells[index]:
+                    building_data[field] = cells[index]
+                    print(f"  📊 {field}: {cells[index]}")
+        except Exception as e:
+            print(f"  ⚠️ Error extracting table data (Building Class, Tax Class, Total Value, Taxable Billable AV): {str(e)}")
+
+        return building_data
+    
     def scrape_building_data(self, borough=None, block=None, lot=None, url=None):
         """Main method to scrape building data using borough/block/lot or URL"""
+        if borough and block and lot and self.warm_sessions:
+            # A resident browser already has the search form loaded
+            return self.warm_sessions.lookup(borough, block, lot)
+        
         driver, wait = self._setup_driver()
         
         try:
             if borough and block and lot:
-                # Navigate to the portal and fill out the form
-                print("🌐 Navigating to Property Information Portal...")
-                driver.get("https://propertyinformationportal.nyc.gov/")
-                
-                # Wait for page to load
-                wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                time.sleep(2)
-                
-                print(f"📝 Filling out form with Borough={borough}, Block={block}, Lot={lot}")
-                
-                # Find and select the borough dropdown
-                borough_select = wait.until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "select[aria-label='Select borough']"))
-                )
-                select = Select(borough_select)
-                select.select_by_value(str(borough))
-                print(f"  ✓ Selected borough: {borough}")
-                
-                # Find and fill the block input
-                # The form has form-floating divs where input comes before label
-                block_input = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'form-floating')]//label[contains(text(), 'Block')]/preceding-sibling::input | //div[contains(@class, 'form-floating')]//input[following-sibling::label[contains(text(), 'Block')]] | //label[@for='block']/../input | //input[@id='block']"))
-                )
-                block_input.clear()
-                block_input.send_keys(str(block))
-                print(f"  ✓ Entered block: {block}")
-                
-                # Find and fill the lot input
-                lot_input = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'form-floating')]//label[contains(text(), 'Lot')]/preceding-sibling::input | //div[contains(@class, 'form-floating')]//input[following-sibling::label[contains(text(), 'Lot')]] | //label[@for='lot']/../input | //input[@id='lot']"))
-                )
-                lot_input.clear()
-                lot_input.send_keys(str(lot))
-                print(f"  ✓ Entered lot: {lot}")
-                
-                # Find and click the submit button
-                submit_button = driver.find_element(By.XPATH, "//button[@type='submit' and contains(text(), 'Search')]")
-                submit_button.click()
-                print("  ✓ Submitted form")
-                
-                # Wait for navigation to the parcel page
-                time.sleep(3)
-                wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
-                
+                self._open_search(driver, wait)
+                return self._search(driver, wait, borough, block, lot)
             elif url:
                 # Legacy support: if URL is provided, use it directly
                 print(f"🌐 Navigating to URL: {url}")
@@ -77,7 +196,7 @@ class BISWEBScraper(BaseScraper):
             scraper_name = self.__class__.__name__
             raise Exception(f"Error scraping {scraper_name} data: {str(e)}\nFull traceback: {error_details}")
         finally:
-            driver.quit()
+            self._quit_driver(driver)
     
     def _scrape_building_info(self, driver):
         """Scrape building information from the BISWEB page"""
@@ -89,7 +208,7 @@ class BISWEBScraper(BaseScraper):
         try:
             print("  ⏳ Waiting for Building Information card to load...")
             # Find the card with "Building Information" text
-            building_info_card = wait.until(EC.visibility_of_element_located((By.XPATH, "//div[contains(@class, 'card')]//p[contains(text(), 'Building Information')]/ancestor::div[contains(@class, 'card')]")))
+            building_info_card = wait.until(EC.visibility_of_element_located((By.XPATH, self.INFO_CARD_XPATH)))
             print("  ✅ Building Information card loaded")
             
             # Wait a bit for nested content to populate
@@ -98,14 +217,14 @@ class BISWEBScraper(BaseScraper):
             # Find all label-value pairs in the card
             # Each pair is in a div with class "sc-kdBSHD gjouCV"
             # Value is in p.sc-hRJfrW.jVlUZz, label is in p.sc-cfxfcM.eyvGek
-            info_sections = building_info_card.find_elements(By.CSS_SELECTOR, ".sc-gFAWRd.evnkkT")
-            valid_labels = ["Residential Units", "Commercial Units", "Commercial Area", "Year Built", "Stories"]
+            info_sections = building_info_card.find_elements(By.CSS_SELECTOR, self.INFO_SECTION_CSS)
+            valid_labels = self.INFO_LABELS
             for section in info_sections:
-                info_items = section.find_elements(By.CSS_SELECTOR, ".sc-kdBSHD.gjouCV")
+                info_items = section.find_elements(By.CSS_SELECTOR, self.INFO_ITEM_CSS)
                 for item in info_items:
                     try:
-                        label_elem = item.find_element(By.CSS_SELECTOR, "p.sc-cfxfcM.eyvGek")
-                        value_elem = item.find_element(By.CSS_SELECTOR, "p.sc-hRJfrW.jVlUZz")
+                        label_elem = item.find_element(By.CSS_SELECTOR, self.INFO_LABEL_CSS)
+                        value_elem = item.find_element(By.CSS_SELECTOR, self.INFO_VALUE_CSS)
                         
                         label = self.get_element_text(label_elem)
                         value = self.get_element_text(value_elem)
@@ -125,7 +244,7 @@ class BISWEBScraper(BaseScraper):
         # Extract Building Type
         try:
             print("  ⏳ Waiting for Building Type element...")
-            building_type_element = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, "p.sc-hRJfrW.jVlUZz")))
+            building_type_element = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, self.INFO_VALUE_CSS)))
             building_type = self.get_element_text(building_type_element)
             if building_type:
                 building_data["Building Type"] = building_type
@@ -137,7 +256,7 @@ class BISWEBScraper(BaseScraper):
         try:
             print("  ⏳ Waiting for table to load...")
             # Wait for table header to be visible
-            table_header = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, "thead.table-primary")))
+            table_header = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, self.ASSESSMENT_HEADER_CSS)))
             
             # Wait a bit for table content to populate
             time.sleep(1)
@@ -174,23 +293,11 @@ class BISWEBScraper(BaseScraper):
             # Based on the thead structure: FY, Building Class, Tax Class, Land Value, Improvement Value, Total Value, Change, Taxable Billable AV, Change
             # We want Building Class (index 1), Tax Class (index 2), Total Value (index 5) and Taxable Billable AV (index 7)
             if len(cells) >= 8:
-                building_class = self.get_element_text(cells[1])
-                tax_class = self.get_element_text(cells[2])
-                total_value = self.get_element_text(cells[5])
-                taxable_value = self.get_element_text(cells[7])
-                
-                if building_class:
-                    building_data["Building Class"] = building_class
-                    print(f"  📊 Building Class: {building_class}")
-                if tax_class:
-                    building_data["Tax Class"] = tax_class
-                    print(f"  📊 Tax Class: {tax_class}")
-                if total_value:
-                    building_data["Total Value"] = total_value
-                    print(f"  📊 Total Value: {total_value}")
-                if taxable_value:
-                    building_data["Taxable Billable AV"] = taxable_value
-                    print(f"  📊 Taxable Billable AV: {taxable_value}")
+                for field, index in self.ASSESSMENT_COLUMNS.items():
+                    value = self.get_element_text(cells[index])
+                    if value:
+                        building_data[field] = value
+                        print(f"  📊 {field}: {value}")
             else:
                 print(f"  ⚠️ Table row doesn't have enough columns (found {len(cells)}, expected at least 8)")
                 
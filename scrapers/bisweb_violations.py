@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import urllib3
+
+
+class _TableParser(HTMLParser):
+    """Collects every table row of a server-rendered page as a list of (text, hrefs) cells"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.links = []
+        self._row = None
+        self._cell = None
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = {"text": [], "hrefs": []}
+        elif tag == "a" and attrs.get("href"):
+            self._link = {"href": attrs["href"], "text": []}
+            if self._cell is not None:
+                self._cell["hrefs"].append(attrs["href"])
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None and self._row is not None:
+            self._row.append((" ".join("".join(self._cell["text"]).split()), self._cell["hrefs"]))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+            self._row = None
+        elif tag == "a" and self._link is not None:
+            self.links.append((self._link["href"], " ".join("".join(self._link["text"]).split())))
+            self._link = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell["text"].append(data)
+        if self._link is not None:
+            self._link["text"].append(data)
+
+
+class BISWEBViolationsClient:
+    """Fetches full DOB and OATH/ECB violation listings from BISWEB over plain HTTP.
+
+    BISWEB pages are server-rendered, so no browser is needed: a keep-alive
+    connection pool is shared by the DOB and ECB listings, fetched concurrently,
+    and the HTML tables are parsed directly into one dict per violation.
+    """
+
+    BASE_URL = "https://a810-bisweb.nyc.gov/bisweb/"
+
+    # Listing link on the property profile -> servlet that links each violation's detail page
+    LISTINGS = {
+        "DOB": ("ActionsByLocationServlet", "ViolationDisplayServlet"),
+        "ECB": ("ECBQueryByLocationServlet", "ECBQueryByNumberServlet"),
+    }
+
+    def __init__(self, max_connections=8, max_workers=8, timeout=20, max_pages=50):
+        self.max_pages = max_pages
+        self.http = urllib3.PoolManager(
+            maxsize=max_connections,
+            block=True,
+            timeout=urllib3.Timeout(connect=10, read=timeout),
+            retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504)),
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0 Safari/537.36",
+                "Accept": "text/html,application/xhtml+xml",
+                "Connection": "keep-alive",
+            },
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bisweb-http")
+
+    def _get(self, url):
+        """GET a page through the shared pool and return its parsed tables and links"""
+        response = self.http.request("GET", url)
+        if response.status != 200:
+            raise Exception(f"BISWEB returned HTTP {response.status} for {url}")
+        parser = _TableParser()
+        parser.feed(response.data.decode("utf-8", errors="replace"))
+        return parser
+
+    def listing_urls(self, borough, block, lot):
+        """Read the property profile and return the absolute DOB/ECB listing URLs it links to"""
+        url = (
+            f"{self.BASE_URL}PropertyProfileOverviewServlet?"
+            f"boro={borough}&block={block}&lot={lot}&go3=+GO+&requestid=0"
+        )
+        print(f"🌐 Fetching BISWEB property profile over HTTP: {url}")
+        page = self._get(url)
+        urls = {}
+        for name, (servlet, _) in self.LISTINGS.items():
+            for href, _ in page.links:
+                if servlet in href:
+                    urls[name] = urljoin(self.BASE_URL, href)
+                    break
+        return urls
+
+    def _parse_violation_rows(self, page, detail_servlet):
+        """Pick out the rows linking to a violation detail page and key them by the header row above"""
+        violations = []
+        header = None
+        previous = None
+        for row in page.rows:
+            is_violation = any(detail_servlet in href for _, hrefs in row for href in hrefs)
+            if not is_violation:
+                previous = row
+                continue
+            if header is None:
+                # The column header is the row directly above the first violation row
+                header = [text or f"Column {i + 1}" for i, (text, _) in enumerate(previous or [])]
+                if len(header) != len(row):
+                    header = [f"Column {i + 1}" for i in range(len(row))]
+            violations.append({
+                header[i] if i < len(header) else f"Column {i + 1}": text
+                for i, (text, _) in enumerate(row)
+            })
+        return violations
+
+    def fetch_listing(self, url, detail_servlet):
+        """Fetch every page of one violation listing, following its Next links.
+
+        Pages are fetched one after another: each page's URL is only known from
+        the Next link on the page before it. Returns (violations, truncated), where
+        truncated is True if the walk stopped at max_pages with pages left.
+        """
+        violations = []
+        seen = set()
+        pages = 0
+        while url and url not in seen and pages < self.max_pages:
+            seen.add(url)
+            pages += 1
+            page = self._get(url)
+            violations.extend(self._parse_violation_rows(page, detail_servlet))
+            url = next(
+                (urljoin(self.BASE_URL, href) for href, text in page.links if text.lower().startswith("next")),
+                None,
+            )
+        truncated = bool(url) and url not in seen
+        if truncated:
+            print(f"  ⚠️ Stopped after {self.max_pages} pages; the listing has more violations")
+        print(f"  📊 {len(violations)} violations across {pages} page(s)")
+        return violations, truncated
+
+    def fetch_violations(self, borough, block, lot):
+        """Return {"DOB Violation Details": [...], "ECB Violation Details": [...]} for a lot.
+
+        Both listings are fetched concurrently over the shared connection pool. Each
+        comes with a "... Violation Details Truncated" flag, True when it was cut off
+        at max_pages.
+        """
+        urls = self.listing_urls(borough, block, lot)
+        futures = {
+            name: self.executor.submit(self.fetch_listing, urls[name], detail_servlet)
+            for name, (_, detail_servlet) in self.LISTINGS.items()
+            if name in urls
+        }
+        details = {}
+        for name, future in futures.items():
+            violations, truncated = future.result()
+            details[f"{name} Violation Details"] = violations
+            details[f"{name} Violation Details Truncated"] = truncated
+        return details
@@ -0,0 +1,451 @@
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import psutil
+import websockets
+from .hpd_scraper import HPDScraper
+from .bisweb_scraper import BISWEBScraper
+from .dobnow_scraper import DOBNOWScraper
+from .bisweb_property_scraper import BISWEBPropertyScraper, lot_bins
+from .bisweb_violations import BISWEBViolationsClient
+from .circuit_breaker import breakers, CircuitOpenError
+from .metrics import metrics
+from .pipeline import merge_building_dobnow, source_label
+
+# Tried in order when no binary is given (CHROME_BINARY overrides)
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+# Resolves a selector the same way for every page helper: XPath if it starts with / or (, CSS otherwise
+_FIND_JS = """function (selector, all) {
+    if (selector.startsWith('/') || selector.startsWith('(')) {
+        var found = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < found.snapshotLength; i++) { nodes.push(found.snapshotItem(i)); }
+        return all ? nodes : (nodes[0] || null);
+    }
+    return all ? Array.from(document.querySelectorAll(selector)) : document.querySelector(selector);
+}"""
+
+_TEXT_JS = "function (node) { return (node.innerText || node.textContent || '').trim(); }"
+
+
+class CDPError(Exception):
+    """Chrome rejected a DevTools command, or the connection to it was lost"""
+
+
+def find_chrome(binary=None):
+    """Path of the Chrome binary to launch"""
+    binary = binary or os.environ.get("CHROME_BINARY")
+    if binary:
+        return binary
+    for name in CHROME_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise CDPError("Chrome not found; set CHROME_BINARY to its path")
+
+
+class CDPPage:
+    """One tab in its own browser context (separate cookies and storage), driven over a flat CDP session"""
+
+    def __init__(self, browser, context_id, target_id, session_id):
+        self.browser = browser
+        self.context_id = context_id
+        self.target_id = target_id
+        self.session_id = session_id
+
+    async def send(self, method, params=None, timeout=30):
+        return await self.browser.send(method, params, session_id=self.session_id, timeout=timeout)
+
+    async def _prepare(self):
+        # Same webdriver hiding as BaseScraper, and no "HeadlessChrome" in the user agent
+        await self.send("Page.addScriptToEvaluateOnNewDocument", {
+            "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        })
+        await self.send("Emulation.setUserAgentOverride", {"userAgent": self.browser.user_agent})
+
+    async def goto(self, url, timeout=30):
+        """Navigate and wait for the new document to finish loading"""
+        result = await self.send("Page.navigate", {"url": url}, timeout=timeout)
+        if result.get("errorText"):
+            raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+        await self.wait_for(lambda: self.evaluate("document.readyState === 'complete'"), timeout=timeout)
+
+    async def evaluate(self, expression):
+        """Evaluate a JS expression in the page and return its JSON value"""
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression, "returnByValue": True, "awaitPromise": True
+        })
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text"))
+        return result["result"].get("value")
+
+    async def run(self, selector, body, *args, all=False):
+        """Run a JS function body with the first match bound to `el` (every match to `els` with all=True)
+        and the extra arguments to `args`"""
+        name = "els" if all else "el"
+        expression = (
+            f"(function ({name}, args) {{ var text = {_TEXT_JS}; {body} }})"
+            f"(({_FIND_JS})({json.dumps(selector)}, {json.dumps(all)}), {json.dumps(list(args))})"
+        )
+        return await self.evaluate(expression)
+
+    async def wait_for(self, check, timeout=10, interval=0.25, description=None):
+        """Poll an async check until it returns something truthy, and return that"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                value = await check()
+                if value:
+                    return value
+            except CDPError:
+                # The document is being replaced mid-navigation; try again
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out after {timeout}s waiting for {description or 'page condition'}")
+            await asyncio.sleep(interval)
+
+    async def wait_for_selector(self, selector, timeout=10, visible=False):
+        body = "return !!el && (!args[0] || !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length));"
+        await self.wait_for(lambda: self.run(selector, body, visible), timeout=timeout, description=selector)
+
+    async def text(self, selector):
+        """Visible text of the first match, or None when nothing matches"""
+        return await self.run(selector, "return el ? text(el) : null;")
+
+    async def texts(self, selector, within=None):
+        """Texts of every match, or of the `within` CSS matches inside the first match"""
+        if within:
+            return await self.run(
+                selector, "return el ? Array.from(el.querySelectorAll(args[0])).map(text) : [];", within
+            )
+        return await self.run(selector, "return els.map(text);", all=True)
+
+    async def click(self, selector, timeout=10):
+        await self.wait_for_selector(selector, timeout=timeout)
+        await self.run(selector, "el.click(); return true;")
+
+    async def fill(self, selector, value, timeout=10):
+        """Set an input's value through the native setter and fire the events Angular and React listen for"""
+        await self.wait_for_selector(selector, timeout=timeout)
+        await self.run(selector, """
+            el.focus();
+            Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value').set.call(el, args[0]);
+            el.dispatchEvent(new Event('input', { bubbles: true }));
+            el.dispatchEvent(new Event('change', { bubbles: true }));
+            return true;
+        """, value)
+
+    async def select(self, selector, value, timeout=10):
+        await self.fill(selector, value, timeout=timeout)
+
+    async def close(self):
+        try:
+            await self.browser.send("Target.closeTarget", {"targetId": self.target_id}, timeout=5)
+            await self.browser.send("Target.disposeBrowserContext", {"browserContextId": self.context_id}, timeout=5)
+        except (CDPError, asyncio.TimeoutError) as e:
+            print(f"  ⚠️ Could not close tab cleanly: {e}")
+
+
+class CDPBrowser:
+    """A single Chrome process driven directly over its DevTools websocket"""
+
+    def __init__(self, headless=True, chrome_binary=None, launch_timeout=30):
+        self.headless = headless
+        self.chrome_binary = chrome_binary
+        self.launch_timeout = launch_timeout
+        self.process = None
+        self.user_data_dir = None
+        self.user_agent = None
+        self._ws = None
+        self._reader = None
+        self._pending = {}
+        self._next_id = 0
+        self.peak_rss_mb = 0.0
+
+    async def start(self):
+        """Launch Chrome and connect to it; if that fails, the process and its profile directory are removed"""
+        try:
+            await self._launch()
+        except BaseException:
+            if self.process and self.process.returncode is None:
+                self.process.kill()
+            await self.close()
+            raise
+
+    async def _launch(self):
+        self.user_data_dir = tempfile.mkdtemp(prefix="cdp-chrome-")
+        arguments = [
+            find_chrome(self.chrome_binary),
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--window-size=1920,1080",
+            "--disable-blink-features=AutomationControlled",
+            "about:blank",
+        ]
+        if self.headless:
+            arguments.insert(1, "--headless=new")
+        print("🌐 Launching Chrome for the CDP engine...")
+        self.process = await asyncio.create_subprocess_exec(
+            *arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        # Chrome writes the port it picked and the browser websocket path here once it is listening
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + self.launch_timeout
+        lines = []
+        while len(lines) < 2:
+            if self.process.returncode is not None:
+                raise CDPError(f"Chrome exited during startup with code {self.process.returncode}")
+            if time.monotonic() >= deadline:
+                raise CDPError(f"Chrome did not open its DevTools port within {self.launch_timeout}s")
+            await asyncio.sleep(0.1)
+            if os.path.exists(port_file):
+                with open(port_file, encoding="utf-8") as f:
+                    lines = f.read().split()
+        port, path = lines[0], lines[1]
+        self._ws = await websockets.connect(f"ws://127.0.0.1:{port}{path}", max_size=None, ping_interval=None)
+        self._reader = asyncio.create_task(self._read())
+        version = await self.send("Browser.getVersion")
+        self.user_agent = version["userAgent"].replace("HeadlessChrome", "Chrome")
+        print(f"  ✅ Connected to {version.get('product')} on port {port}")
+
+    async def _read(self):
+        """Resolve each command's future from the responses; events are not used"""
+        try:
+            async for message in self._ws:
+                response = json.loads(message)
+                future = self._pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(CDPError(response["error"].get("message")))
+                else:
+                    future.set_result(response.get("result", {}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("Connection to Chrome closed"))
+            self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=30):
+        """Send one CDP command (to a tab's session when session_id is given) and await its result"""
+        self._next_id += 1
+        message_id = self._next_id
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def new_page(self):
+        """Open a blank tab in a fresh browser context and attach to it"""
+        context_id = (await self.send("Target.createBrowserContext", {"disposeOnDetach": True}))["browserContextId"]
+        target_id = (await self.send(
+            "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+        ))["targetId"]
+        session_id = (await self.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}))["sessionId"]
+        page = CDPPage(self, context_id, target_id, session_id)
+        await page._prepare()
+        return page
+
+    def rss_mb(self):
+        """Resident memory of Chrome's whole process tree (browser, renderers, GPU and utility processes)"""
+        try:
+            root = psutil.Process(self.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except (psutil.NoSuchProcess, AttributeError):
+            return 0.0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        rss = total / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        metrics.set_gauge("cdp.browser_rss_mb", round(rss, 1))
+        return rss
+
+    async def close(self):
+        if self._ws:
+            try:
+                await self.send("Browser.close", timeout=5)
+            except (CDPError, asyncio.TimeoutError, websockets.ConnectionClosed):
+                pass
+            await self._ws.close()
+        if self._reader:
+            self._reader.cancel()
+        if self.process and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class CDPEngine:
+    """Asyncio alternative to ScrapePipeline: one Chrome process, many isolated tabs.
+
+    Every source scrape gets its own tab in its own browser context, and up to
+    max_tabs of them run at once inside the single browser, so concurrency costs
+    a renderer per tab instead of a whole browser plus a blocked thread per
+    scrape. Field extraction is done by each scraper's scrape_page, which reads
+    the same elements as its Selenium path. Summaries have the same shape as
+    ScrapePipeline.scrape.
+    """
+
+    def __init__(self, max_tabs=16, headless=True, chrome_binary=None):
+        self.max_tabs = max_tabs
+        self.browser = CDPBrowser(headless=headless, chrome_binary=chrome_binary)
+        self.hpd_scraper = HPDScraper()
+        self.bisweb_scraper = BISWEBScraper()
+        self.dobnow_scraper = DOBNOWScraper()
+        self.bisweb_property_scraper = BISWEBPropertyScraper()
+        self.bisweb_violations_client = BISWEBViolationsClient()
+        self._tabs = None
+        self._open_tabs = 0
+
+    async def __aenter__(self):
+        self._tabs = asyncio.Semaphore(self.max_tabs)
+        await self.browser.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.browser.close()
+
+    @asynccontextmanager
+    async def page(self):
+        """A fresh tab for the duration of the block, waiting while max_tabs are open"""
+        async with self._tabs:
+            page = await self.browser.new_page()
+            self._open_tabs += 1
+            metrics.set_gauge("cdp.tabs_open", self._open_tabs)
+            try:
+                yield page
+            finally:
+                self._open_tabs -= 1
+                metrics.set_gauge("cdp.tabs_open", self._open_tabs)
+                self.browser.rss_mb()
+                await page.close()
+
+    async def _in_page(self, scrape, *args):
+        async with self.page() as page:
+            return await scrape(page, *args)
+
+    async def _run_source(self, job, source, func, *args, bin_number=None):
+        """Await one source scrape under its circuit breaker; records ok/error/skipped in the job.
+
+        Metrics and circuits are keyed by source; a per-BIN scrape is only told apart
+        in the job's sources and errors, e.g. "DOBNOW (BIN 1000001)".
+        """
+        label = source_label({"source": source, "bin": bin_number})
+        breaker = breakers.get(source)
+        if not breaker.allow():
+            print(f"  ⏭️ Skipping {label}: circuit open")
+            job["sources"][label] = "circuit open"
+            job["errors"][label] = str(CircuitOpenError(breaker.source))
+            return None
+        start = time.time()
+        try:
+            data = await func(*args)
+        except Exception as e:
+            breakers.report(breaker, error=e)
+            print(f"  ⚠️ Error scraping {label}: {e}")
+            metrics.incr(f"scrape.{source}.error")
+            job["sources"][label] = "error"
+            job["errors"][label] = str(e)
+            return None
+        finally:
+            metrics.observe(f"scrape.{source}.seconds", round(time.time() - start, 2))
+        breakers.report(breaker, data)
+        metrics.incr(f"scrape.{source}.ok")
+        job["sources"][label] = "ok"
+        return data
+
+    async def _hpd_then_dobnow(self, job, hpd_building_id):
+        hpd_data = await self._run_source(job, "HPD", self._in_page, self.hpd_scraper.scrape_page, hpd_building_id)
+        if hpd_data:
+            job["data"].update(hpd_data)
+        if not hpd_data or not hpd_data.get("BIN"):
+            job["sources"]["DOBNOW"] = "error"
+            job["errors"]["DOBNOW"] = "No BIN available from HPD"
+            return
+        bin_number = str(hpd_data["BIN"]).strip()
+        # Skipped if the property profile listed this BIN first; its scrape is already under way
+        if bin_number not in job["claimed_bins"]:
+            job["claimed_bins"].add(bin_number)
+            await self._dobnow_for_bin(job, bin_number)
+
+    async def _dobnow_for_bin(self, job, bin_number):
+        data = await self._run_source(
+            job, "DOBNOW", self._in_page, self.dobnow_scraper.scrape_page, bin_number, bin_number=bin_number
+        )
+        if data:
+            job["data"].setdefault("DOBNOW by BIN", {})[bin_number] = data
+
+    async def _property_then_bins(self, job, borough, block, lot):
+        property_data = await self._run_source(
+            job, "BISWEB Property", self._in_page, self.bisweb_property_scraper.scrape_page, borough, block, lot
+        )
+        if not property_data:
+            return
+        job["data"].update(property_data)
+        bins = [b for b in lot_bins(property_data) if b not in job["claimed_bins"]]
+        job["claimed_bins"].update(bins)
+        await asyncio.gather(*(self._dobnow_for_bin(job, bin_number) for bin_number in bins))
+
+    async def _bisweb(self, job, borough, block, lot, violation_details):
+        bisweb_data = await self._run_source(
+            job, "BISWEB", self._in_page, self.bisweb_scraper.scrape_page, borough, block, lot
+        )
+        if bisweb_data:
+            job["data"].update(bisweb_data)
+        if violation_details:
+            # Plain HTTP through the pooled client; runs on a worker thread, no tab needed
+            details = await self._run_source(
+                job, "BISWEB Violations", asyncio.to_thread,
+                self.bisweb_violations_client.fetch_violations, borough, block, lot
+            )
+            if details:
+                job["data"].update(details)
+
+    async def scrape(self, hpd_building_id=None, borough=None, block=None, lot=None, violation_details=False):
+        """Scrape one building's sources concurrently in tabs; returns a summary with per-source errors"""
+        hpd_building_id = str(hpd_building_id).strip() if hpd_building_id else None
+        job = {"data": {}, "sources": {}, "errors": {}, "claimed_bins": set()}
+        start = time.time()
+        tasks = []
+        if hpd_building_id:
+            tasks.append(self._hpd_then_dobnow(job, hpd_building_id))
+        if borough and block and lot:
+            tasks.append(self._bisweb(job, borough, block, lot, violation_details))
+            tasks.append(self._property_then_bins(job, borough, block, lot))
+        await asyncio.gather(*tasks)
+        return {
+            "event": "summary",
+            "data": merge_building_dobnow(job["data"]),
+            "sources": job["sources"],
+            "errors": job["errors"],
+            "resources": {"browser_rss_mb": round(self.browser.rss_mb(), 1)},
+            "elapsed": round(time.time() - start, 2),
+        }
@@ -0,0 +1,186 @@
+import threading
+import time
+import urllib3
+from .metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half open"
+
+# Gauge values, so the state can be graphed
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Landing page of each site, requested by the background probe while its breaker is open
+PROBE_URLS = {
+    "HPD": "https://hpdonline.nyc.gov/hpdonline/",
+    "DOBNOW": "https://a810-dobnow.nyc.gov/publish/Index.html",
+    "BISWEB": "https://propertyinformationportal.nyc.gov/",
+    "BISWEB Property": "https://a810-bisweb.nyc.gov/bisweb/",
+    "BISWEB Violations": "https://a810-bisweb.nyc.gov/bisweb/",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of scraping a source whose breaker is open"""
+
+    def __init__(self, source):
+        super().__init__(f"{source} is unavailable (circuit open), skipped")
+        self.source = source
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one source.
+
+    failure_threshold consecutive failures (errors or timeouts) open it. A
+    scrape that returns no fields still counts as a success: a page can
+    legitimately lack the rows a scraper looks for. While open, scrapes are refused without starting a browser. The
+    background probe, or reset_timeout passing when there is no probe URL,
+    moves it to half open, where a single trial scrape decides whether it
+    closes again or re-opens.
+    """
+
+    def __init__(self, source, probe_url=None, failure_threshold=3, reset_timeout=120):
+        self.source = source
+        self.probe_url = probe_url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trial_running = False
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.set_gauge(f"circuit.{self.source}.state", _STATE_GAUGE[state])
+
+    def allow(self):
+        """True if a scrape may run now; in half open, only one trial at a time is let through"""
+        with self._lock:
+            if self.state == OPEN and not self.probe_url and time.time() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+        metrics.incr(f"circuit.{self.source}.skipped")
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != CLOSED:
+                print(f"✅ {self.source} is back, closing its circuit")
+                self._set_state(CLOSED)
+
+    def record_failure(self, reason):
+        with self._lock:
+            self.failures += 1
+            self.last_error = reason
+            self._trial_running = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                print(f"  ⚠️ {self.source} failed {self.failures} times in a row ({reason}), opening its circuit")
+                self.opened_at = time.time()
+                self._set_state(OPEN)
+                metrics.incr(f"circuit.{self.source}.opened")
+
+    def probe_succeeded(self):
+        """The site answered the background probe: let the next scrape through as a trial"""
+        with self._lock:
+            if self.state == OPEN:
+                print(f"🔎 {self.source} answered the probe, half-opening its circuit")
+                self._set_state(HALF_OPEN)
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "open_seconds": round(time.time() - self.opened_at, 1) if self.state != CLOSED else 0,
+            }
+
+
+class CircuitBreakers:
+    """One breaker per source, plus a probe thread that checks the sites of open breakers"""
+
+    def __init__(self, probe_urls=None, failure_threshold=3, reset_timeout=120, probe_interval=15):
+        self.probe_urls = dict(PROBE_URLS if probe_urls is None else probe_urls)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._prober = None
+        self.http = urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=5, read=10),
+            retries=False,
+            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0 Safari/537.36"},
+        )
+
+    def get(self, source):
+        with self._lock:
+            if source not in self._breakers:
+                self._breakers[source] = CircuitBreaker(
+                    source, self.probe_urls.get(source), self.failure_threshold, self.reset_timeout
+                )
+            return self._breakers[source]
+
+    def call(self, source, func, *args, **kwargs):
+        """Run func under the source's breaker; raises CircuitOpenError without calling it when open"""
+        breaker = self.get(source)
+        if not breaker.allow():
+            raise CircuitOpenError(source)
+        try:
+            data = func(*args, **kwargs)
+        except Exception as e:
+            self.report(breaker, error=e)
+            raise
+        self.report(breaker, data)
+        return data
+
+    def report(self, breaker, data=None, error=None):
+        """Record the outcome of a scrape that breaker.allow() let through; only exceptions are failures"""
+        if error is None:
+            breaker.record_success()
+            return
+        breaker.record_failure(type(error).__name__)
+        self._ensure_prober()
+
+    def _ensure_prober(self):
+        with self._lock:
+            if self._prober and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name="circuit-probe", daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                breakers = list(self._breakers.values())
+            for breaker in breakers:
+                if breaker.state == OPEN and breaker.probe_url:
+                    self._probe(breaker)
+
+    def _probe(self, breaker):
+        try:
+            response = self.http.request("HEAD", breaker.probe_url)
+        except Exception as e:
+            print(f"  ⚠️ Probe of {breaker.source} failed: {e}")
+            return
+        metrics.incr(f"circuit.{breaker.source}.probes")
+        if response.status < 500:
+            breaker.probe_succeeded()
+
+    def status(self):
+        """State of every breaker that has seen traffic"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.source: breaker.status() for breaker in breakers}
+
+
+breakers = CircuitBreakers()
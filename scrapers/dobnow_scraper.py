@@ -1,13 +1,30 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+import asyncio
 import time
 from .base_scraper import BaseScraper
+from .warm_session import WarmSearchMixin
 
 
-class DOBNOWScraper(BaseScraper):
+class DOBNOWScraper(WarmSearchMixin, BaseScraper):
     """Scraper for DOBNOW website to extract building data"""
     
+    BIN_BUTTON_XPATH = "//button[@role='img' and @aria-label='Search by BIN']"
+    
+    # Label/value rows of the search results (the flood check is one of them). If none render,
+    # the search itself failed, which is an error rather than a building without the row
+    RESULTS_XPATH = "//div[contains(@class, 'top-pad-5')]//strong"
+    RESULTS_TIMEOUT = 20
+    
+    # Label div of the Special Flood Hazard Area Check, and its value div relative to it
+    FLOOD_LABEL_XPATH = "//div[contains(@class, 'col-xs-8') and contains(@class, 'col-sm-6') and contains(@class, 'col-md-4') and contains(@class, 'col-lg-4') and contains(@class, 'top-pad-5')]//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[contains(@class, 'col-xs-8')]"
+    FLOOD_VALUE_XPATH = "./following-sibling::div[contains(@class, 'col-xs-4') and contains(@class, 'col-sm-6') and contains(@class, 'col-md-8') and contains(@class, 'col-lg-8') and contains(@class, 'top-pad-5') and contains(@class, 'ng-binding')]"
+    # Fallbacks for layout changes: any bound value in the label's row, then the div right after the label
+    FLOOD_ALT_XPATH = "//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[contains(@class, 'row') or contains(@class, 'col-')]//div[contains(@class, 'ng-binding') and contains(@class, 'top-pad-5')]"
+    FLOOD_LAST_RESORT_XPATH = "//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[1]/following-sibling::div[contains(@class, 'ng-binding')]"
+    
     def _scrape_flood_hazard_check(self, driver):
         """Scrape Special Flood Hazard Area Check from the page"""
         print("🌊 Scraping Special Flood Hazard Area Check...")
@@ -26,16 +43,12 @@ class DOBNOWScraper(BaseScraper):
             # Method 1: Find the label div, then find the next sibling value div
             try:
                 # Find the div containing the label
-                label_div_xpath = "//div[contains(@class, 'col-xs-8') and contains(@class, 'col-sm-6') and contains(@class, 'col-md-4') and contains(@class, 'col-lg-4') and contains(@class, 'top-pad-5')]//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[contains(@class, 'col-xs-8')]"
-                
-                label_div = wait.until(EC.presence_of_element_located((By.XPATH, label_div_xpath)))
+                label_div = wait.until(EC.presence_of_element_located((By.XPATH, self.FLOOD_LABEL_XPATH)))
                 print("  ✅ Found Special Flood Hazard Area Check label div")
                 
                 # Find the next sibling div that contains the value
                 # The value div should be the next sibling with the specific classes
-                value_div_xpath = "./following-sibling::div[contains(@class, 'col-xs-4') and contains(@class, 'col-sm-6') and contains(@class, 'col-md-8') and contains(@class, 'col-lg-8') and contains(@class, 'top-pad-5') and contains(@class, 'ng-binding')]"
-                
-                value_element = label_div.find_element(By.XPATH, value_div_xpath)
+                value_element = label_div.find_element(By.XPATH, self.FLOOD_VALUE_XPATH)
                 flood_hazard_value = self.get_element_text(value_element)
                 
                 if flood_hazard_value:
@@ -54,8 +67,7 @@ class DOBNOWScraper(BaseScraper):
             try:
                 print("  🔄 Trying alternative extraction method...")
                 # Alternative: Find the strong element, then find the value div in the same row
-                alt_xpath = "//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[contains(@class, 'row') or contains(@class, 'col-')]//div[contains(@class, 'ng-binding') and contains(@class, 'top-pad-5')]"
-                value_element = wait.until(EC.presence_of_element_located((By.XPATH, alt_xpath)))
+                value_element = wait.until(EC.presence_of_element_located((By.XPATH, self.FLOOD_ALT_XPATH)))
                 flood_hazard_value = self.get_element_text(value_element)
                 if flood_hazard_value:
                     building_data["Special Flood Hazard Area Check"] = flood_hazard_value
@@ -65,8 +77,7 @@ class DOBNOWScraper(BaseScraper):
                 # Last resort: try to find any div with ng-binding that follows the label
                 try:
                     print("  🔄 Trying last resort extraction method...")
-                    last_resort_xpath = "//strong[contains(text(), 'Special Flood Hazard Area Check')]/ancestor::div[1]/following-sibling::div[contains(@class, 'ng-binding')]"
-                    value_element = wait.until(EC.presence_of_element_located((By.XPATH, last_resort_xpath)))
+                    value_element = wait.until(EC.presence_of_element_located((By.XPATH, self.FLOOD_LAST_RESORT_XPATH)))
                     flood_hazard_value = self.get_element_text(value_element)
                     if flood_hazard_value:
                         building_data["Special Flood Hazard Area Check"] = flood_hazard_value
@@ -85,12 +96,14 @@ class DOBNOWScraper(BaseScraper):
         # Wait a bit more for dynamic content to start loading (Angular apps need time)
         time.sleep(3)
         
-        # Wait for Angular to finish loading (check for ng-binding class or other Angular indicators)
+        # Wait for the results rows; raising here lets the circuit breaker see an outage
         try:
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".ng-binding, [ng-binding]")))
-            print("  ✅ Angular content detected")
-        except Exception:
-            print("  ⚠️ Angular content not detected, continuing anyway...")
+            WebDriverWait(driver, self.RESULTS_TIMEOUT).until(
+                EC.presence_of_element_located((By.XPATH, self.RESULTS_XPATH))
+            )
+            print("  ✅ Search results detected")
+        except TimeoutException:
+            raise Exception(f"DOBNOW search results did not render within {self.RESULTS_TIMEOUT}s")
         
         # Additional wait for dynamic content
         time.sleep(2)
@@ -100,84 +113,116 @@ class DOBNOWScraper(BaseScraper):
         
         return building_data
 
+    SEARCH_URL = "https://a810-dobnow.nyc.gov/publish/Index.html#!/search"
+    
+    def _show_bin_search(self, driver, wait, settle=4):
+        """Open the BIN search panel and wait for its input"""
+        # Click the BIN search button
+        print("🔘 Clicking BIN search button...")
+        bin_button = wait.until(EC.element_to_be_clickable((By.XPATH, self.BIN_BUTTON_XPATH)))
+        bin_button.click()
+        print("waiting")
+        wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+        print("ready")
+        time.sleep(settle)
+        wait.until(EC.presence_of_element_located((By.ID, "enterbin")))
+    
+    def _open_search(self, driver, wait):
+        """Load the DOBNOW app on its search page with the BIN panel open"""
+        print(f"🌐 Navigating to DOBNOW search page: {self.SEARCH_URL}")
+        driver.get(self.SEARCH_URL)
+        wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+        self._show_bin_search(driver, wait)
+    
+    def _search_ready(self, driver):
+        """True when the BIN input is on screen and a lookup can be submitted"""
+        inputs = driver.find_elements(By.ID, "enterbin")
+        return bool(inputs) and inputs[0].is_displayed()
+    
+    def _reset_search(self, driver, wait):
+        """Return to the search panel inside the already-loaded app (a hash route change, no reload)"""
+        driver.execute_script("window.location.hash = '#!/search';")
+        self._show_bin_search(driver, wait, settle=1)
+    
+    def _search(self, driver, wait, input_str):
+        """Enter a BIN on the open search panel, submit it and scrape the results"""
+        # Enter the building ID in the input field
+        print(f"⌨️  Entering BIN: {input_str}")
+        bin_input = driver.find_element(By.ID, "enterbin")
+
+        # Use JavaScript to set the value AND trigger Angular input event
+        driver.execute_script("""
+        var input = arguments[0];
+        var value = arguments[1];
+        input.focus();
+        input.value = value;
+        input.dispatchEvent(new Event('input', { bubbles: true }));
+        input.dispatchEvent(new Event('change', { bubbles: true }));
+        """, bin_input, input_str)
+        
+        # Click the search button
+        print("🔍 Clicking search button...")
+        time.sleep(2)
+        search_btn = driver.find_element(By.ID, "search2")
+        driver.execute_script("arguments[0].click();", search_btn)
+        
+        # Wait for results to load
+        print("⏳ Waiting for search results...")
+        time.sleep(3) 
+        
+        # Scrape the data from the results page
+        return self._scrape_data(driver, wait)
+
+    async def scrape_page(self, page, building_id):
+        """CDP-engine counterpart of scrape_building_data: the same BIN search and flood hazard lookup in a tab"""
+        input_str = str(building_id).strip()
+        print(f"🌐 [cdp] Navigating to DOBNOW search page for BIN {input_str}")
+        await page.goto(self.SEARCH_URL)
+        await page.click(self.BIN_BUTTON_XPATH)
+        # The Angular app needs time to settle between steps; sleeping here holds no thread
+        await asyncio.sleep(4)
+        await page.fill("#enterbin", input_str)
+        await asyncio.sleep(2)
+        await page.click("#search2")
+        await asyncio.sleep(3)
+        try:
+            await page.wait_for_selector(self.RESULTS_XPATH, timeout=self.RESULTS_TIMEOUT)
+        except TimeoutError:
+            raise Exception(f"DOBNOW search results did not render within {self.RESULTS_TIMEOUT}s")
+        await asyncio.sleep(2)
+
+        value_xpath = self.FLOOD_LABEL_XPATH + self.FLOOD_VALUE_XPATH[1:]
+        for xpath in (value_xpath, self.FLOOD_ALT_XPATH, self.FLOOD_LAST_RESORT_XPATH):
+            try:
+                await page.wait_for_selector(xpath, timeout=20)
+            except TimeoutError:
+                continue
+            flood_hazard_value = await page.text(xpath)
+            if flood_hazard_value:
+                print(f"  📊 Special Flood Hazard Area Check: {flood_hazard_value}")
+                return {"Special Flood Hazard Area Check": flood_hazard_value}
+        print("  ⚠️ All extraction methods failed for Special Flood Hazard Area Check")
+        return {}
+
     def scrape_building_data(self, building_id):
         """Scrape building data using a BIN (Building Identification Number).
         
         Navigates to the DOBNOW search page, clicks the BIN search button,
-        enters the building ID, and performs the search.
+        enters the building ID, and performs the search. With warm sessions
+        enabled, the lookup runs in a browser already sitting on the search page.
         
         Args:
             building_id: The BIN to search for (7-digit number)
         """
-        try:    
-            # Normalize input
-            input_str = str(building_id).strip()
-            
-            # Start with the search page
-            search_url = "https://a810-dobnow.nyc.gov/publish/Index.html#!/search"
-            print(f"🌐 Navigating to DOBNOW search page: {search_url}")
-            
-            # Use the base class setup to create driver and navigate
-            driver, wait = self._setup_driver()
-            
-            # Navigate to the search page
-            driver.get(search_url)
-            wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
-            # Click the BIN search button
-            print("🔘 Clicking BIN search button...")
-            bin_button_xpath = "//button[@role='img' and @aria-label='Search by BIN']"
-            bin_button = wait.until(EC.element_to_be_clickable((By.XPATH, bin_button_xpath)))
-            bin_button.click()
-            print("waiting")
-            wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
-            print("ready")
-            time.sleep(4)
-            
-            # Enter the building ID in the input field
-            print(f"⌨️  Entering BIN: {input_str}")
-            bin_input = wait.until(EC.presence_of_element_located((By.ID, "enterbin")))
-            # bin_input = wait.until(
-            #     EC.element_to_be_clickable((By.ID, "enterbin"))
-            # )
-            # print('waited')
-            bin_input = driver.find_element(By.ID, "enterbin")
-
-            bin_input = driver.find_element(By.ID, "enterbin")
-
-            # Use JavaScript to set the value AND trigger Angular input event
-            driver.execute_script("""
-            var input = arguments[0];
-            var value = arguments[1];
-            input.focus();
-            input.value = value;
-            input.dispatchEvent(new Event('input', { bubbles: true }));
-            input.dispatchEvent(new Event('change', { bubbles: true }));
-            """, bin_input, input_str)
-
-            # time.sleep(300)
-            # driver.execute_script("arguments[0].focus();", bin_input)
-            # print('focuised')
-            # bin_input.click()
-            # print('clicked')
-            # bin_input.send_keys(input_str)
-            
-            # Click the search button
-            print("🔍 Clicking search button...")
-            time.sleep(2)
-            search_btn = driver.find_element(By.ID, "search2")
-            driver.execute_script("arguments[0].click();", search_btn)
-            
-            # Wait for results to load
-            print("⏳ Waiting for search results...")
-            time.sleep(3) 
-            
-            # Scrape the data from the results page
-            data = self._scrape_data(driver, wait)
-            
-            return data
+        # Normalize input
+        input_str = str(building_id).strip()
+        if self.warm_sessions:
+            return self.warm_sessions.lookup(input_str)
+        
+        try:
+            return self._cold_search(input_str)
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
             print(f"Full error traceback:\n{error_details}")
             raise Exception(f"Error scraping {e} data: {str(e)}\nFull traceback: {error_details}")
-
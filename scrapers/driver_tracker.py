@@ -0,0 +1,250 @@
+from contextlib import contextmanager
+import threading
+import time
+import psutil
+from .metrics import metrics
+
+
+class TrackedDriver:
+    """Bookkeeping for one live WebDriver and its chromedriver/Chrome process tree"""
+
+    def __init__(self, driver, scope, resident, on_close=None):
+        self.driver = driver
+        self.on_close = on_close
+        self.scope = scope
+        self.resident = resident
+        self.started = time.time()
+        # Refreshed by long walks (e.g. paginated listings) so the age limit means "no progress for that long"
+        self.last_progress = self.started
+        self.pid = driver.service.process.pid if driver.service.process else None
+        self.rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+        self.cpu_by_pid = {}
+        self.killed_reason = None
+
+    def close(self):
+        """Run the owner's cleanup callback once the browser is gone"""
+        if self.on_close:
+            try:
+                self.on_close()
+            except Exception as e:
+                print(f"  ⚠️ Error cleaning up after driver: {e}")
+
+    @property
+    def cpu_seconds(self):
+        return sum(self.cpu_by_pid.values())
+
+    def processes(self):
+        """Return chromedriver plus every Chrome process it spawned"""
+        if not self.pid:
+            return []
+        try:
+            root = psutil.Process(self.pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def sample(self):
+        """Update RSS and CPU figures from the current process tree"""
+        rss = 0
+        for proc in self.processes():
+            try:
+                rss += proc.memory_info().rss
+                cpu = proc.cpu_times()
+                # Keep the last figure seen for processes that have since exited
+                self.cpu_by_pid[proc.pid] = cpu.user + cpu.system
+            except psutil.Error:
+                continue
+        self.rss_mb = rss / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, self.rss_mb)
+
+
+class ScrapeScope:
+    """Groups the drivers created while scraping one source for one request"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.entries = []
+        self.closed = False
+        self.cancelled = False
+
+    def usage(self):
+        """Resource figures for every driver this scope created"""
+        return {
+            "drivers": len(self.entries),
+            "peak_rss_mb": round(max((e.peak_rss_mb for e in self.entries), default=0.0), 1),
+            "cpu_seconds": round(sum(e.cpu_seconds for e in self.entries), 2),
+            "killed": [e.killed_reason for e in self.entries if e.killed_reason],
+        }
+
+
+class DriverTracker:
+    """Registry of every driver created through BaseScraper.
+
+    A watchdog thread samples RSS/CPU of each driver's process tree and
+    force-kills drivers that exceed the memory ceiling, go max_age_seconds
+    without reporting progress(), or are still running after their owning scope ended.
+    """
+
+    def __init__(self, max_rss_mb=2048, max_age_seconds=600, interval=2.0):
+        self.max_rss_mb = max_rss_mb
+        self.max_age_seconds = max_age_seconds
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._local = threading.local()
+        self._watchdog = None
+
+    def _scope_stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def scope(self, label, scope=None):
+        """Attribute drivers created in this thread to a scope; orphans are killed on exit.
+
+        Pass a ScrapeScope created elsewhere to let another thread cancel it with kill_scope.
+        """
+        scope = scope or ScrapeScope(label)
+        stack = self._scope_stack()
+        stack.append(scope)
+        try:
+            yield scope
+        finally:
+            stack.pop()
+            scope.closed = True
+            for entry in list(scope.entries):
+                if self.kill(entry, "orphaned"):
+                    print(f"  ⚠️ Driver outlived scope '{label}', killed it")
+            usage = scope.usage()
+            metrics.observe(f"scrape.{label}.peak_rss_mb", usage["peak_rss_mb"])
+            metrics.observe(f"scrape.{label}.cpu_seconds", usage["cpu_seconds"])
+
+    def current_scope(self):
+        stack = self._scope_stack()
+        return stack[-1] if stack else None
+
+    def register(self, driver, resident=False, on_close=None):
+        """Start tracking a new driver.
+
+        Resident drivers are long-lived: they belong to no scope and are exempt
+        from the age limit, but still subject to the memory ceiling. on_close is
+        called after the driver is quit or killed.
+        """
+        entry = TrackedDriver(driver, None if resident else self.current_scope(), resident, on_close)
+        entry.sample()
+        with self._lock:
+            self._entries[id(driver)] = entry
+            metrics.set_gauge("drivers.live", len(self._entries))
+        if entry.scope:
+            entry.scope.entries.append(entry)
+        metrics.incr("drivers.created")
+        self._ensure_watchdog()
+        if entry.scope and entry.scope.cancelled:
+            # Cancelled before its browser came up; the scrape fails fast instead of running
+            self.kill(entry, "cancelled")
+        return entry
+
+    def progress(self, driver):
+        """Note that a long-running driver is still making progress, restarting its age limit"""
+        with self._lock:
+            entry = self._entries.get(id(driver))
+        if entry:
+            entry.last_progress = time.time()
+
+    def kill_scope(self, scope, reason="cancelled"):
+        """Cancel a scope from another thread: kill its live drivers and any it creates later"""
+        scope.cancelled = True
+        for entry in list(scope.entries):
+            self.kill(entry, reason)
+
+    def release(self, driver):
+        """Take a final sample, quit the driver and stop tracking it"""
+        with self._lock:
+            entry = self._entries.pop(id(driver), None)
+            metrics.set_gauge("drivers.live", len(self._entries))
+        if entry:
+            entry.sample()
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"  ⚠️ Error quitting driver: {e}")
+        if entry:
+            entry.close()
+
+    def kill(self, entry, reason):
+        """Force-kill a driver's whole process tree; returns False if it was already released"""
+        with self._lock:
+            if self._entries.get(id(entry.driver)) is not entry:
+                return False
+            del self._entries[id(entry.driver)]
+            metrics.set_gauge("drivers.live", len(self._entries))
+        entry.killed_reason = reason
+        metrics.incr(f"drivers.killed.{reason}")
+        entry.sample()
+        for proc in reversed(entry.processes()):
+            try:
+                proc.kill()
+            except psutil.Error:
+                continue
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+        entry.close()
+        return True
+
+    def _ensure_watchdog(self):
+        with self._lock:
+            if self._watchdog and self._watchdog.is_alive():
+                return
+            self._watchdog = threading.Thread(target=self._watch, name="driver-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._check_drivers()
+            except Exception as e:
+                print(f"  ⚠️ Driver watchdog error: {e}")
+
+    def _check_drivers(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        total_rss = 0.0
+        for entry in entries:
+            entry.sample()
+            total_rss += entry.rss_mb
+            if entry.rss_mb > self.max_rss_mb:
+                print(f"  ⚠️ Driver using {entry.rss_mb:.0f} MB (limit {self.max_rss_mb} MB), killing it")
+                self.kill(entry, "memory")
+            elif not entry.resident and time.time() - entry.last_progress > self.max_age_seconds:
+                print(f"  ⚠️ Driver made no progress for {self.max_age_seconds}s, killing it")
+                self.kill(entry, "age")
+            elif entry.scope and entry.scope.closed:
+                self.kill(entry, "orphaned")
+        metrics.set_gauge("drivers.rss_mb", round(total_rss, 1))
+
+    def stats(self):
+        """Current figures for every live driver"""
+        with self._lock:
+            entries = list(self._entries.values())
+        now = time.time()
+        return [
+            {
+                "scope": entry.scope.label if entry.scope else None,
+                "resident": entry.resident,
+                "age_seconds": round(now - entry.started, 1),
+                "rss_mb": round(entry.rss_mb, 1),
+                "peak_rss_mb": round(entry.peak_rss_mb, 1),
+                "cpu_seconds": round(entry.cpu_seconds, 2),
+            }
+            for entry in entries
+        ]
+
+
+# Shared tracker for every driver created through BaseScraper
+tracker = DriverTracker()
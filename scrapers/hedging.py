@@ -0,0 +1,47 @@
+from collections import defaultdict, deque
+import threading
+from .metrics import metrics
+
+
+class HedgePolicy:
+    """Decides when a straggling scrape deserves a second attempt.
+
+    Each source's recent completion times give a latency percentile; a scrape
+    still running after that long is hedged, as long as the share of recent
+    scrapes that were hedged stays under max_hedge_rate. Until a source has
+    min_samples completions there is no history to judge by and nothing is hedged.
+    """
+
+    def __init__(self, percentile=0.95, max_hedge_rate=0.1, min_samples=20, window=200, min_delay=2.0):
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._hedged = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, source, seconds, hedged):
+        """Record a finished scrape: how long the winning attempt took and whether it was hedged"""
+        with self._lock:
+            self._latencies[source].append(seconds)
+            self._hedged[source].append(hedged)
+
+    def delay(self, source):
+        """Seconds to wait before hedging this source, or None when there is too little history"""
+        with self._lock:
+            latencies = sorted(self._latencies[source])
+        if len(latencies) < self.min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile))
+        threshold = max(self.min_delay, latencies[index])
+        metrics.set_gauge(f"hedging.{source}.delay_seconds", round(threshold, 2))
+        return threshold
+
+    def allow_hedge(self, source):
+        """True if hedging one more scrape keeps the source under the hedge-rate cap"""
+        with self._lock:
+            history = self._hedged[source]
+            hedges = sum(history)
+            # Count the scrape being decided on, as if it were hedged
+            return (hedges + 1) / (len(history) + 1) <= self.max_hedge_rate
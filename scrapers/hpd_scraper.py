@@ -1,13 +1,69 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+import asyncio
 import time
-from .base_scraper import BaseScraper
+from .base_scraper import BaseScraper, locator
+from .driver_tracker import tracker
+
+
+class HPDViolation(NamedTuple):
+    """One HPD violation row, kept as a small typed tuple so large listings stay cheap"""
+    violation_id: int
+    violation_class: str
+    date: Optional[date]
+    status: str
+
+    def to_dict(self):
+        return {
+            "violation_id": self.violation_id,
+            "class": self.violation_class,
+            "date": self.date.isoformat() if self.date else None,
+            "status": self.status,
+        }
+
+
+def _parse_violation_date(text):
+    """Parse the dates HPD Online shows (MM/DD/YYYY, sometimes ISO); None if unparseable"""
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text.strip()[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
 
 
 class HPDScraper(BaseScraper):
     """Scraper for HPD Online website to extract building data"""
     
+    OVERVIEW_URL = "https://hpdonline.nyc.gov/hpdonline/building/{building_id}/overview"
+    
+    VIOLATION_COUNT_XPATH = "//span[contains(normalize-space(.),'{vtype} Class')]/span[@class='fw-bold']"
+    
+    # Output field -> selector of the element holding its value on the overview page
+    DETAIL_SELECTORS = {
+        "Stories": "//div[contains(@class,'card-content')][.//div[text()='STOREYS']]//div[contains(@class,'card-content-botttom')]",
+        "A Units": "//div[contains(@class,'card-content')][.//div[text()='A UNITS']]//div[contains(@class,'card-content-botttom')]",
+        "B Units": "//div[contains(@class,'card-content')][.//div[text()='B UNITS']]//div[contains(@class,'card-content-botttom')]",
+        "BIN": "//div[contains(@class,'card-content')][.//div[text()='BIN']]//div[contains(@class,'card-content-botttom')]",
+        "Litigation": "span.fs-base > span.fw-bold",
+        "AEP Status": "//span[text()='Alternate Enforcement Program (AEP)']/../../../../div[contains(@class,'content-right')]//span",
+        "CONH Status": "//span[text()='Certification of No Harassment Pilot Program']/../../../../div[contains(@class,'content-right')]//span",
+    }
+    
+    # Reads the current page of the violations table in one round trip: header labels plus cell texts per row
+    _READ_VIOLATIONS_PAGE_JS = """
+    var table = document.querySelector('table');
+    if (!table) { return null; }
+    var headers = Array.from(table.querySelectorAll('thead th')).map(function (th) { return th.textContent.trim(); });
+    var rows = Array.from(table.querySelectorAll('tbody tr')).map(function (tr) {
+        return Array.from(tr.querySelectorAll('td')).map(function (td) { return td.textContent.trim(); });
+    });
+    return {headers: headers, rows: rows};
+    """
+    
     def _scrape_violations(self, driver):
         """Scrape violation data from the page"""
         print("🔍 Scraping violation data...")
@@ -16,7 +72,7 @@ class HPDScraper(BaseScraper):
         
         for vtype in violation_types:
             try:
-                element = driver.find_element(By.XPATH, f"//span[contains(normalize-space(.),'{vtype} Class')]/span[@class='fw-bold']")
+                element = driver.find_element(By.XPATH, self.VIOLATION_COUNT_XPATH.format(vtype=vtype))
                 text = self.get_element_text(element)
                 print(f"  {vtype} Class violations: '{text}'")
                 violations[vtype] = int(text) if text else 0
@@ -26,55 +82,92 @@ class HPDScraper(BaseScraper):
         
         return violations
     
-    def _scrape_building_details(self, driver):
-        """Scrape building details from the page"""
-        print("🏢 Scraping building details...")
-        
-        stories_element = driver.find_element(
-            By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='STOREYS']]//div[contains(@class,'card-content-botttom')]"
-        )
-        stories = self.get_element_text(stories_element)
-        
-        a_units_element = driver.find_element(
-            By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='A UNITS']]//div[contains(@class,'card-content-botttom')]"
-        )
-        a_units = self.get_element_text(a_units_element)
-        bin_element = driver.find_element(
-            By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='BIN']]//div[contains(@class,'card-content-botttom')]"
-        )
-        bin = self.get_element_text(bin_element)
-    
-        b_units_element = driver.find_element(
-            By.XPATH, "//div[contains(@class,'card-content')][.//div[text()='B UNITS']]//div[contains(@class,'card-content-botttom')]"
-        )
-        b_units = self.get_element_text(b_units_element)
+    def _violation_columns(self, headers):
+        """Map header labels to (id, class, date, status) column indexes, falling back to table order"""
+        labels = [h.lower() for h in headers]
 
-        litigation_element = driver.find_element(
-            By.CSS_SELECTOR, "span.fs-base > span.fw-bold"
-        )
-        litigation_number = self.get_element_text(litigation_element)
+        def find(*keywords, default):
+            for index, label in enumerate(labels):
+                if any(keyword in label for keyword in keywords):
+                    return index
+            return default
 
-        aep_element = driver.find_element(
-            By.XPATH,
-            "//span[text()='Alternate Enforcement Program (AEP)']/../../../../div[contains(@class,'content-right')]//span"
+        return (
+            find("violation id", "id", default=0),
+            find("class", default=1),
+            find("date", default=2),
+            find("status", default=3),
         )
-        aep_status = self.get_element_text(aep_element)
 
-        conh_element = driver.find_element(
-            By.XPATH,
-            "//span[text()='Certification of No Harassment Pilot Program']/../../../../div[contains(@class,'content-right')]//span"
+    def _parse_violation_row(self, cells, columns):
+        """Turn one row of cell texts into an HPDViolation; None for rows that aren't violations"""
+        id_col, class_col, date_col, status_col = columns
+        if len(cells) <= max(columns):
+            return None
+        violation_id = "".join(ch for ch in cells[id_col] if ch.isdigit())
+        if not violation_id:
+            return None
+        return HPDViolation(
+            violation_id=int(violation_id),
+            violation_class=cells[class_col].strip().upper()[:1],
+            date=_parse_violation_date(cells[date_col]),
+            status=" ".join(cells[status_col].split()),
         )
-        conh_status = self.get_element_text(conh_element)
+
+    def iter_violations(self, building_id, open_only=True):
+        """Walk the HPD Online violations listing page by page, yielding HPDViolation records.
+
+        Only one page of rows is held at a time, so memory stays flat however many
+        violations the building has, and the first rows are available as soon as
+        the first page renders. With open_only, closed and dismissed violations are skipped.
+        Each page read counts as progress, so a long walk is not cut off by the tracker's age limit.
+        """
+        url = f"https://hpdonline.nyc.gov/hpdonline/building/{str(building_id).strip()}/violations"
+        driver, wait = self._setup_driver()
+        try:
+            print(f"🌐 Navigating to HPD violations listing: {url}")
+            driver.get(url)
+            wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr, .p-datatable-emptymessage")))
+
+            page_number = 1
+            columns = None
+            while True:
+                page = driver.execute_script(self._READ_VIOLATIONS_PAGE_JS)
+                if not page or not page["rows"]:
+                    break
+                if columns is None:
+                    columns = self._violation_columns(page["headers"])
+                tracker.progress(driver)
+                print(f"  📄 Violations page {page_number}: {len(page['rows'])} rows")
+                for cells in page["rows"]:
+                    violation = self._parse_violation_row(cells, columns)
+                    if violation is None:
+                        continue
+                    if open_only and any(word in violation.status.upper() for word in ("CLOSE", "DISMISS")):
+                        continue
+                    yield violation
+
+                # Stop at the last page, otherwise advance and wait for the rows to be replaced
+                next_buttons = driver.find_elements(By.CSS_SELECTOR, "button.p-paginator-next")
+                if not next_buttons or not next_buttons[0].is_enabled() or "p-disabled" in (next_buttons[0].get_attribute("class") or ""):
+                    break
+                first_row = driver.find_element(By.CSS_SELECTOR, "table tbody tr")
+                driver.execute_script("arguments[0].click();", next_buttons[0])
+                wait.until(EC.staleness_of(first_row))
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
+                page_number += 1
+        finally:
+            self._quit_driver(driver)
+
+    def _scrape_building_details(self, driver):
+        """Scrape building details from the page"""
+        print("🏢 Scraping building details...")
         
-        return {
-            "stories": stories,
-            "a_units": a_units,
-            "b_units": b_units,
-            "bin": bin,
-            "litigation": litigation_number,
-            "aep_status": aep_status,
-            "conh_status": conh_status
-        }
+        details = {}
+        for field, selector in self.DETAIL_SELECTORS.items():
+            details[field] = self.get_element_text(driver.find_element(*locator(selector)))
+        return details
     
     def _scrape_data(self, driver, wait):
         """Scrape building data from HPD page"""
@@ -85,26 +178,36 @@ class HPDScraper(BaseScraper):
         # Scrape violations
         violations = self._scrape_violations(driver)
         
-        # Scrape building details
-        building_details = self._scrape_building_details(driver)
-        
-        # Combine all data into a dictionary
-        data = {
-            "Stories": building_details["stories"],
-            "A Units": building_details["a_units"],
-            "B Units": building_details["b_units"],
-            "BIN": building_details["bin"],
-            "Litigation": building_details["litigation"],
-            "AEP Status": building_details["aep_status"],
-            "CONH Status": building_details["conh_status"],
-            "A Violations": violations["A"],
-            "B Violations": violations["B"],
-            "C Violations": violations["C"],
-            "I Violations": violations["I"],
-        }
+        # Building details first, then the violation counts
+        data = self._scrape_building_details(driver)
+        for vtype, count in violations.items():
+            data[f"{vtype} Violations"] = count
         
         return data
 
+    async def scrape_page(self, page, building_id):
+        """CDP-engine counterpart of scrape_building_data for a building id: same selectors, same fields"""
+        url = self.OVERVIEW_URL.format(building_id=str(building_id).strip())
+        print(f"🌐 [cdp] Navigating to HPD overview: {url}")
+        await page.goto(url)
+        await page.wait_for_selector("div.p-card-content")
+        await asyncio.sleep(2)
+
+        data = {}
+        for field, selector in self.DETAIL_SELECTORS.items():
+            text = await page.text(selector)
+            if text is None:
+                raise ValueError(f"{field} not found on the HPD overview page")
+            data[field] = text
+        for vtype in ("A", "B", "C", "I"):
+            text = await page.text(self.VIOLATION_COUNT_XPATH.format(vtype=vtype))
+            try:
+                data[f"{vtype} Violations"] = int(text) if text else 0
+            except ValueError:
+                print(f"  ❌ Unreadable {vtype} violation count: '{text}'")
+                data[f"{vtype} Violations"] = 0
+        return data
+
     def scrape_building_data(self, building_id_or_url):
         """Accept either a HPD building id (digits) or a full URL.
 
@@ -117,7 +220,7 @@ class HPDScraper(BaseScraper):
 
         # If the input looks like a building id (all digits), construct the overview URL
         if input_str.isdigit():
-            url = f"https://hpdonline.nyc.gov/hpdonline/building/{input_str}/overview"
+            url = self.OVERVIEW_URL.format(building_id=input_str)
             print(f"🌐 HPD building id provided — navigating to: {url}")
             return super().scrape_building_data(url)
 
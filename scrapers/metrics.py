@@ -0,0 +1,52 @@
+from collections import defaultdict, deque
+import threading
+
+
+class Metrics:
+    """Thread-safe in-process counters, gauges and recent-value summaries"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    def incr(self, name, value=1):
+        """Add to a monotonically increasing counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name, value):
+        """Record the current value of something that goes up and down"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """Record one observation (e.g. a duration) for a summary over the recent window"""
+        with self._lock:
+            self._samples[name].append(value)
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dict"""
+        with self._lock:
+            summaries = {}
+            for name, values in self._samples.items():
+                if not values:
+                    continue
+                ordered = sorted(values)
+                summaries[name] = {
+                    "count": len(ordered),
+                    "mean": round(sum(ordered) / len(ordered), 3),
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+
+# Shared registry used by the scrapers, pipeline and app
+metrics = Metrics()
@@ -0,0 +1,360 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+import queue
+import threading
+import time
+from .base_scraper import BaseScraper
+from .hpd_scraper import HPDScraper
+from .bisweb_scraper import BISWEBScraper
+from .dobnow_scraper import DOBNOWScraper
+from .bisweb_property_scraper import BISWEBPropertyScraper, lot_bins
+from .bisweb_violations import BISWEBViolationsClient
+from .circuit_breaker import breakers, CircuitOpenError
+from .driver_tracker import tracker, ScrapeScope
+from .metrics import metrics
+from .scheduler import Scheduler, INTERACTIVE, BATCH, PRIORITIES
+
+
+# Put on a job's event queue once its last task has finished
+_DONE = object()
+
+
+def merge_building_dobnow(data):
+    """Copy the building's own DOBNOW fields from "DOBNOW by BIN" to the top level.
+
+    The building's BIN is HPD's, else the property profile's. DOBNOW results are
+    always stored by BIN, so where they land does not depend on which scrape
+    claimed the BIN first.
+    """
+    building_bin = data.get("BIN") or data.get("Property BIN")
+    by_bin = data.get("DOBNOW by BIN", {})
+    if building_bin and str(building_bin).strip() in by_bin:
+        data.update(by_bin[str(building_bin).strip()])
+    return data
+
+
+def _uses_browser(func):
+    """True for a bound method of a Selenium scraper; plain-HTTP sources need no browser"""
+    return isinstance(getattr(func, "__self__", None), BaseScraper)
+
+
+def source_label(event):
+    """Name of an event's source in summaries, e.g. "DOBNOW (BIN 1000001)" for per-BIN scrapes"""
+    if event.get("bin"):
+        return f"{event['source']} (BIN {event['bin']})"
+    return event["source"]
+
+
+class _ScrapeJob:
+    """State shared by the source scrapes of one building request"""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.events = queue.Queue()
+        self.futures = []
+        self.claimed_bins = set()
+        self.lock = threading.Lock()
+        # True while iter_events is still submitting the first tasks
+        self.submitting = True
+        self.finished = False
+
+    def task_done(self):
+        """Signal the end of the event stream once no task is left running or about to be submitted"""
+        with self.lock:
+            if self.finished or self.submitting or not all(f.done() for f in self.futures):
+                return
+            self.finished = True
+        self.events.put(_DONE)
+
+
+class ScrapePipeline:
+    """Runs the per-source scrapers for one building concurrently and reports
+    each source's fields as soon as that scraper finishes"""
+
+    def __init__(self, max_workers=8, warm_sessions=0, scheduler=None, hedge_policy=None):
+        self.hpd_scraper = HPDScraper()
+        self.bisweb_scraper = BISWEBScraper()
+        self.dobnow_scraper = DOBNOWScraper()
+        self.bisweb_property_scraper = BISWEBPropertyScraper()
+        if warm_sessions:
+            # Keep DOBNOW and the Property Information Portal loaded between lookups
+            self.dobnow_scraper.enable_warm_sessions(warm_sessions)
+            self.bisweb_scraper.enable_warm_sessions(warm_sessions)
+        self.bisweb_violations_client = BISWEBViolationsClient()
+        self.scheduler = scheduler or Scheduler()
+        # Optional HedgePolicy: interactive scrapes that straggle get a second attempt
+        self.hedge_policy = hedge_policy
+        # One pool per priority class, so batch jobs queued behind the scheduler
+        # never hold the threads interactive jobs need to reach it
+        self.executors = {
+            priority: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"scrape-{priority}")
+            for priority in PRIORITIES
+        }
+        self._lock = threading.Lock()
+
+    def _submit(self, job, func, *args, **kwargs):
+        """Start a task for this job; the future is tracked so iter_events waits for it"""
+        future = self.executors[job.priority].submit(func, job, *args, **kwargs)
+        with job.lock:
+            job.futures.append(future)
+        # Tasks that fan out submit their follow-ups before they finish, so the
+        # last future to complete is the end of the job
+        future.add_done_callback(lambda _: job.task_done())
+        return future
+
+    def _run_source(self, job, source, func, *args, bin_number=None, **kwargs):
+        """Run one scraper and push a source event (or an error event) onto the queue.
+
+        A browser scrape waits for a scheduler slot of the job's priority (plain-HTTP
+        sources need none). Every scrape runs inside a tracker scope, so any driver
+        it leaks is killed and its browser RSS/CPU figures are attached to the event. Interactive scrapes may be hedged.
+        A source whose circuit is open is skipped at once with a ``skipped`` event
+        instead. Metrics, scopes and circuits are keyed by source; a per-BIN scrape
+        only carries its BIN in the event's ``bin`` field.
+        """
+        label = source_label({"source": source, "bin": bin_number})
+        breaker = breakers.get(source)
+        if not breaker.allow():
+            print(f"  ⏭️ Skipping {label}: circuit open")
+            event = {"event": "skipped", "source": source, "status": "circuit open",
+                     "error": str(CircuitOpenError(breaker.source)), "elapsed": 0}
+            if bin_number:
+                event["bin"] = bin_number
+            job.events.put(event)
+            return None
+
+        start = time.time()
+        data = None
+        scopes = [ScrapeScope(source)]
+        hedged = False
+        with self.scheduler.slot(job.priority) if _uses_browser(func) else nullcontext():
+            try:
+                if self._hedgeable(job, func):
+                    data, hedged = self._call_hedged(job, breaker.source, scopes, func, args, kwargs)
+                else:
+                    with tracker.scope(source, scope=scopes[0]):
+                        data = func(*args, **kwargs)
+                breakers.report(breaker, data)
+                event = {"event": "source", "source": source, "data": data}
+                metrics.incr(f"scrape.{source}.ok")
+            except Exception as e:
+                breakers.report(breaker, error=e)
+                print(f"  ⚠️ Error scraping {label}: {e}")
+                event = {"event": "error", "source": source, "error": str(e)}
+                metrics.incr(f"scrape.{source}.error")
+        elapsed = time.time() - start
+        metrics.observe(f"scrape.{source}.seconds", round(elapsed, 2))
+        event["elapsed"] = round(elapsed, 2)
+        event["resources"] = _combined_usage(scopes)
+        if hedged:
+            event["hedged"] = True
+        if bin_number:
+            event["bin"] = bin_number
+        job.events.put(event)
+        return data
+
+    def _hedgeable(self, job, func):
+        """Hedge interactive browser scrapes only, and not those served by warm sessions.
+
+        The loser is cancelled by killing its scope's browser, which cannot stop a
+        plain-HTTP fetch or a lookup in a resident browser (and a hedged warm lookup
+        would only queue for the same pool).
+        """
+        if not self.hedge_policy or job.priority != INTERACTIVE or not _uses_browser(func):
+            return False
+        return not func.__self__.warm_sessions
+
+    def _call_hedged(self, job, source, scopes, func, args, kwargs):
+        """Run func, starting a second attempt if it outlives the source's latency percentile.
+
+        source is the circuit name, so per-BIN scrapes share one latency history.
+        The first successful attempt wins and the other is cancelled by killing its
+        browser. Returns (data, hedged); raises if every attempt failed.
+        """
+        results = queue.Queue()
+
+        # Latency is measured from the primary's start, so a hedged win includes the wait before the hedge
+        start = time.time()
+
+        def attempt(scope, holds_extra_slot):
+            try:
+                with tracker.scope(source, scope=scope):
+                    results.put((scope, func(*args, **kwargs), None, time.time() - start))
+            except Exception as e:
+                results.put((scope, None, e, time.time() - start))
+            finally:
+                if holds_extra_slot:
+                    self.scheduler.release(job.priority)
+
+        threading.Thread(target=attempt, args=(scopes[0], False), name=f"attempt-{source}", daemon=True).start()
+        outcomes = []
+        delay = self.hedge_policy.delay(source)
+        try:
+            outcomes.append(results.get(timeout=delay))
+        except queue.Empty:
+            # A hedge needs its own browser slot; skip it rather than queue behind other work
+            if self.hedge_policy.allow_hedge(source) and self.scheduler.try_acquire(job.priority):
+                print(f"  🐢 {source} still running after {delay:.1f}s, starting a hedged attempt")
+                metrics.incr(f"hedging.{source}.hedges")
+                scopes.append(ScrapeScope(source))
+                threading.Thread(target=attempt, args=(scopes[1], True), name=f"hedge-{source}", daemon=True).start()
+
+        # Wait for the first success, or for every attempt to have failed
+        while not outcomes or (outcomes[-1][2] is not None and len(outcomes) < len(scopes)):
+            outcomes.append(results.get())
+        winner, data, error, seconds = outcomes[-1]
+        for scope in scopes:
+            if scope is not winner:
+                tracker.kill_scope(scope, "hedge_loser")
+
+        hedged = len(scopes) > 1
+        if hedged and error is None:
+            metrics.incr(f"hedging.{source}.won_by_{'hedge' if winner is scopes[1] else 'primary'}")
+        if error is not None:
+            raise error
+        # Only completed scrapes feed the latency history; fast failures would drag the percentile down
+        self.hedge_policy.record(source, seconds, hedged)
+        return data, hedged
+
+    def _claim_bin(self, job, bin_number):
+        """Record that DOBNOW is being scraped for a BIN; False if this request already did"""
+        with self._lock:
+            if bin_number in job.claimed_bins:
+                return False
+            job.claimed_bins.add(bin_number)
+            return True
+
+    def _dobnow_for_bin(self, job, bin_number):
+        """Scrape DOBNOW for one BIN; the result is filed under that BIN whichever task claimed it"""
+        self._run_source(job, "DOBNOW", self.dobnow_scraper.scrape_building_data, bin_number, bin_number=bin_number)
+
+    def _hpd_then_dobnow(self, job, hpd_building_id):
+        """HPD gives us the BIN that DOBNOW is searched by, so DOBNOW is chained after it"""
+        hpd_data = self._run_source(job, "HPD", self.hpd_scraper.scrape_building_data, hpd_building_id)
+        if hpd_data and hpd_data.get("BIN"):
+            # Skipped if the property profile listed this BIN first; its scrape is already under way
+            bin_number = str(hpd_data["BIN"]).strip()
+            if self._claim_bin(job, bin_number):
+                self._dobnow_for_bin(job, bin_number)
+        else:
+            job.events.put({"event": "error", "source": "DOBNOW", "error": "No BIN available from HPD", "elapsed": 0})
+
+    def _property_then_bins(self, job, borough, block, lot):
+        """Scrape the property profile, then fan DOBNOW out concurrently over the lot's BINs"""
+        property_data = self._run_source(
+            job, "BISWEB Property", self.bisweb_property_scraper.scrape_building_data,
+            borough=borough, block=block, lot=lot
+        )
+        if not property_data:
+            return
+        for bin_number in lot_bins(property_data):
+            if not self._claim_bin(job, bin_number):
+                continue
+            print(f"🔀 Fanning out DOBNOW scrape for BIN {bin_number}")
+            # Submitted before this task finishes, so iter_events keeps waiting for it
+            self._submit(job, self._dobnow_for_bin, bin_number)
+
+    def _submit_jobs(self, job, hpd_building_id=None, borough=None, block=None, lot=None, violation_details=False):
+        """Start every scraper that has inputs"""
+        if hpd_building_id:
+            self._submit(job, self._hpd_then_dobnow, hpd_building_id)
+        if borough and block and lot:
+            self._submit(
+                job, self._run_source, "BISWEB", self.bisweb_scraper.scrape_building_data,
+                borough=borough, block=block, lot=lot
+            )
+            self._submit(job, self._property_then_bins, borough, block, lot)
+            if violation_details:
+                # Plain HTTP, no browser: runs alongside the Chrome-based scrapes
+                self._submit(
+                    job, self._run_source, "BISWEB Violations", self.bisweb_violations_client.fetch_violations,
+                    borough, block, lot
+                )
+
+    def iter_events(self, hpd_building_id=None, borough=None, block=None, lot=None, violation_details=False,
+                    priority=INTERACTIVE):
+        """Yield one event per source as it completes, then a final summary event.
+
+        Events are dicts with an ``event`` key of ``source``, ``error``, ``skipped``
+        (circuit open) or ``summary``.
+        The summary carries the merged fields of every source that succeeded. DOBNOW
+        results are keyed by BIN under ``DOBNOW by BIN``, and the building's own BIN's
+        fields are also copied to the top level (see merge_building_dobnow).
+        With violation_details, the full BISWEB DOB and ECB violation tables are
+        fetched as well, as lists of per-violation rows. priority selects the
+        scheduler class (interactive or batch) the source scrapes queue in.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        hpd_building_id = str(hpd_building_id).strip() if hpd_building_id else None
+        job = _ScrapeJob(priority)
+        start = time.time()
+        self._submit_jobs(job, hpd_building_id, borough, block, lot, violation_details)
+        with job.lock:
+            job.submitting = False
+        job.task_done()
+
+        all_data = {}
+        sources = {}
+        resources = {}
+        while True:
+            event = job.events.get()
+            if event is _DONE:
+                break
+            label = source_label(event)
+            if event["event"] == "source" and "bin" in event:
+                all_data.setdefault("DOBNOW by BIN", {})[event["bin"]] = event["data"]
+                sources[label] = "ok"
+            elif event["event"] == "source":
+                all_data.update(event["data"])
+                sources[label] = "ok"
+            elif event["event"] == "skipped":
+                sources[label] = event["status"]
+            else:
+                sources[label] = "error"
+            if "resources" in event:
+                resources[label] = event["resources"]
+            yield event
+
+        yield {
+            "event": "summary",
+            "data": merge_building_dobnow(all_data),
+            "sources": sources,
+            "resources": resources,
+            "circuits": breakers.status(),
+            "priority": priority,
+            "elapsed": round(time.time() - start, 2),
+        }
+
+    def scrape(self, priority=INTERACTIVE, **building):
+        """Scrape one building to completion; returns its summary plus per-source errors"""
+        errors = {}
+        summary = {}
+        for event in self.iter_events(priority=priority, **building):
+            if event["event"] == "error" or event.get("status") == "circuit open":
+                errors[source_label(event)] = event["error"]
+            elif event["event"] == "summary":
+                summary = event
+        summary["errors"] = errors
+        return summary
+
+    def iter_batch(self, buildings, concurrency=4, priority=BATCH):
+        """Scrape many buildings (dicts of iter_events arguments) and yield (index, summary) as each finishes"""
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-building") as executor:
+            futures = {
+                executor.submit(self.scrape, priority=priority, **building): index
+                for index, building in enumerate(buildings)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _combined_usage(scopes):
+    """Resource figures summed over every attempt of one source scrape"""
+    usages = [scope.usage() for scope in scopes]
+    return {
+        "drivers": sum(u["drivers"] for u in usages),
+        "peak_rss_mb": max(u["peak_rss_mb"] for u in usages),
+        "cpu_seconds": round(sum(u["cpu_seconds"] for u in usages), 2),
+        "killed": [reason for u in usages for reason in u["killed"]],
+    }
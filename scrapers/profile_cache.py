@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+import time
+import psutil
+
+
+class ProfileCache:
+    """Persistent Chrome profile and HTTP disk cache directories, one per pool slot.
+
+    Chrome refuses to share a profile directory between running instances, so
+    each driver leases a slot exclusively (a lock file holding the owner pid
+    guards against other processes on the same machine using the same root).
+    When every slot is busy the caller falls back to a temporary profile.
+    """
+
+    def __init__(self, root, slots=4, max_cache_mb=512, cleanup_interval=3600):
+        self.root = os.path.abspath(root)
+        self.slots = slots
+        self.max_cache_mb = max_cache_mb
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._leased = set()
+        self._last_cleanup = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _slot_dir(self, slot):
+        return os.path.join(self.root, f"slot-{slot}")
+
+    def _lock_path(self, slot):
+        return os.path.join(self.root, f"slot-{slot}.lock")
+
+    def _try_lock(self, slot):
+        """Take the cross-process lock for a slot, breaking it if its owner has died"""
+        path = self._lock_path(slot)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                with os.fdopen(fd, "w") as f:
+                    f.write(str(os.getpid()))
+                return True
+            except FileExistsError:
+                try:
+                    with open(path) as f:
+                        owner = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    owner = 0
+                if owner and psutil.pid_exists(owner):
+                    return False
+                # Stale lock from a process that exited without releasing it
+                try:
+                    os.remove(path)
+                except OSError:
+                    return False
+        return False
+
+    def acquire(self):
+        """Lease a free slot; returns its index or None if every slot is busy"""
+        with self._lock:
+            for slot in range(self.slots):
+                if slot in self._leased or not self._try_lock(slot):
+                    continue
+                self._leased.add(slot)
+                break
+            else:
+                return None
+        profile_dir = self._slot_dir(slot)
+        os.makedirs(profile_dir, exist_ok=True)
+        # A killed Chrome leaves its singleton files behind, which would block the next launch
+        for name in ("SingletonLock", "SingletonSocket", "SingletonCookie"):
+            try:
+                os.remove(os.path.join(profile_dir, name))
+            except OSError:
+                pass
+        return slot
+
+    def chrome_arguments(self, slot):
+        """Command-line switches pointing Chrome at the slot's profile and size-limited cache"""
+        profile_dir = self._slot_dir(slot)
+        return [
+            f"--user-data-dir={profile_dir}",
+            f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}",
+            f"--disk-cache-size={self.max_cache_mb * 1024 * 1024}",
+        ]
+
+    def release(self, slot):
+        """Return a slot to the pool, pruning it first if its periodic cleanup is due"""
+        try:
+            if time.time() - self._last_cleanup.get(slot, 0) > self.cleanup_interval:
+                self._cleanup(slot)
+        finally:
+            with self._lock:
+                self._leased.discard(slot)
+                try:
+                    os.remove(self._lock_path(slot))
+                except OSError:
+                    pass
+
+    def _cleanup(self, slot):
+        """Drop caches that grew past the limit; Chrome only bounds the HTTP cache itself"""
+        self._last_cleanup[slot] = time.time()
+        profile_dir = self._slot_dir(slot)
+        size_mb = _dir_size(profile_dir) / (1024 * 1024)
+        if size_mb <= self.max_cache_mb:
+            return
+        print(f"  🧹 Profile slot {slot} is {size_mb:.0f} MB (limit {self.max_cache_mb} MB), pruning caches")
+        for relative in ("cache", os.path.join("Default", "Code Cache"), os.path.join("Default", "Service Worker", "CacheStorage")):
+            shutil.rmtree(os.path.join(profile_dir, relative), ignore_errors=True)
+        if _dir_size(profile_dir) / (1024 * 1024) > self.max_cache_mb * 2:
+            # Something other than the caches is growing; start the slot from scratch
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def _dir_size(path):
+    """Total size in bytes of all files under path"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                continue
+    return total
@@ -0,0 +1,214 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+from .bisweb_property_scraper import parse_additional_bins
+
+
+def parse_int(text):
+    """'1,204' -> 1204; None for blanks and placeholders like 'N/A'"""
+    if text is None:
+        return None
+    if isinstance(text, (int, np.integer)):
+        return int(text)
+    digits = re.sub(r"[^\d\-]", "", str(text).split(".")[0])
+    return int(digits) if digits not in ("", "-") else None
+
+
+def parse_currency(text):
+    """'$1,234,000' -> 1234000.0; None for blanks"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float, np.number)):
+        return float(text)
+    cleaned = re.sub(r"[^\d.\-]", "", str(text))
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_flag(text):
+    """Yes/No style status text -> bool; None when the text says neither"""
+    if text is None or isinstance(text, bool):
+        return text
+    value = str(text).strip().lower()
+    if not value:
+        return None
+    if value in ("none", "n/a") or re.search(r"\b(no|not|inactive|false|discharged)\b", value):
+        return False
+    if re.search(r"\b(yes|active|true|in|designated|landmark|l)\b", value):
+        return True
+    return None
+
+
+def parse_bins(text):
+    """Flattened 'Additional BINs' text -> tuple of BINs (empty for NONE)"""
+    if isinstance(text, (list, tuple)):
+        return tuple(int(b) for b in text)
+    return tuple(int(b) for b in parse_additional_bins(str(text or "")))
+
+
+# Normalized column -> (scraper field names in order of preference, parser, pandas dtype)
+SCHEMA = {
+    "bin": (["BIN", "Property BIN"], parse_int, "Int32"),
+    "stories": (["Stories"], parse_int, "Int16"),
+    "a_units": (["A Units"], parse_int, "Int32"),
+    "b_units": (["B Units"], parse_int, "Int32"),
+    "residential_units": (["Residential Units"], parse_int, "Int32"),
+    "commercial_units": (["Commercial Units"], parse_int, "Int32"),
+    "commercial_area": (["Commercial Area"], parse_int, "Int64"),
+    "year_built": (["Year Built"], parse_int, "Int16"),
+    "litigation": (["Litigation"], parse_int, "Int32"),
+    "aep": (["AEP Status"], parse_flag, "boolean"),
+    "conh": (["CONH Status"], parse_flag, "boolean"),
+    "landmark": (["Landmark Status"], parse_flag, "boolean"),
+    "flood_hazard": (["Special Flood Hazard Area Check"], parse_flag, "boolean"),
+    "a_violations": (["A Violations"], parse_int, "Int32"),
+    "b_violations": (["B Violations"], parse_int, "Int32"),
+    "c_violations": (["C Violations"], parse_int, "Int32"),
+    "i_violations": (["I Violations"], parse_int, "Int32"),
+    "dob_violations_total": (["DOB Violations Total"], parse_int, "Int32"),
+    "dob_violations_open": (["DOB Violations Open"], parse_int, "Int32"),
+    "ecb_violations_total": (["ECB Violations Total"], parse_int, "Int32"),
+    "ecb_violations_open": (["ECB Violations Open"], parse_int, "Int32"),
+    "building_type": (["Building Type"], str, "category"),
+    "building_class": (["Building Class"], str, "category"),
+    "tax_class": (["Tax Class"], str, "category"),
+    "total_value": (["Total Value"], parse_currency, "float64"),
+    "taxable_billable_av": (["Taxable Billable AV"], parse_currency, "float64"),
+    "additional_bins": (["Additional BINs"], parse_bins, "object"),
+}
+
+
+def fits_dtype(value, dtype):
+    """False for an int outside the range of a nullable integer dtype such as Int16"""
+    if value is None or not dtype.startswith("Int"):
+        return True
+    limits = np.iinfo(dtype.lower())
+    return limits.min <= value <= limits.max
+
+
+def normalize_record(raw, record_id=None):
+    """Map one merged scraper dict onto the fixed schema with typed values (None when missing or out of range)"""
+    record = {"id": record_id}
+    for column, (fields, parser, dtype) in SCHEMA.items():
+        value = None
+        for field in fields:
+            if raw.get(field) not in (None, ""):
+                try:
+                    value = parser(raw[field])
+                except (TypeError, ValueError):
+                    value = None
+                break
+        record[column] = value if fits_dtype(value, dtype) else None
+    return record
+
+
+class RecordStore:
+    """Typed, column-oriented store of normalized building records.
+
+    New records are buffered and folded into a DataFrame with compact dtypes
+    (nullable small ints, booleans, categories) when the frame is next read.
+    A later record for the same id replaces the earlier one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._frame = self._empty_frame()
+
+    @staticmethod
+    def _empty_frame():
+        frame = pd.DataFrame({"id": pd.Series(dtype="string")})
+        for column, (_, _, dtype) in SCHEMA.items():
+            frame[column] = pd.Series(dtype=dtype)
+        return frame
+
+    @staticmethod
+    def _typed(frame):
+        frame["id"] = frame["id"].astype("string")
+        for column, (_, _, dtype) in SCHEMA.items():
+            frame[column] = frame[column].astype(dtype)
+        return frame
+
+    def add(self, raw, record_id=None):
+        """Normalize and buffer one raw scraper dict"""
+        record = normalize_record(raw, record_id)
+        with self._lock:
+            self._pending.append(record)
+        return record
+
+    def frame(self):
+        """The whole store as a typed DataFrame"""
+        with self._lock:
+            if self._pending:
+                # Taken out first, so a batch that fails to cast is dropped instead of failing every read
+                pending, self._pending = self._pending, []
+                batch = self._typed(pd.DataFrame(pending, columns=["id", *SCHEMA]))
+                combined = pd.concat([self._frame, batch], ignore_index=True) if len(self._frame) else batch
+                combined = combined.drop_duplicates(subset="id", keep="last", ignore_index=True)
+                self._frame = self._typed(combined)
+            return self._frame.copy()
+
+    def __len__(self):
+        return len(self.frame())
+
+
+def _jsonable(value):
+    """Convert numpy/pandas scalars (and missing values) to plain JSON types"""
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _ranking(frame, metric, top):
+    """Top rows by a metric Series aligned with frame, as [{id, value}]"""
+    ranked = metric.dropna().sort_values(ascending=False).head(top)
+    return [
+        {"id": _jsonable(frame.at[index, "id"]), "value": round(float(value), 4)}
+        for index, value in ranked.items()
+    ]
+
+
+def portfolio_analytics(frame, top=10):
+    """Totals, distributions and rankings over a typed building frame, using column operations only"""
+    counts = [
+        "a_units", "b_units", "residential_units", "commercial_units", "litigation",
+        "a_violations", "b_violations", "c_violations", "i_violations",
+        "dob_violations_open", "ecb_violations_open",
+    ]
+    totals = {column: _jsonable(frame[column].sum()) for column in counts}
+    totals["total_value"] = _jsonable(frame["total_value"].sum())
+    totals["taxable_billable_av"] = _jsonable(frame["taxable_billable_av"].sum())
+    totals["buildings"] = len(frame)
+    for flag in ("aep", "conh", "landmark", "flood_hazard"):
+        totals[flag] = _jsonable(frame[flag].sum())
+
+    distributions = {}
+    for column in ("building_class", "tax_class", "building_type"):
+        distributions[column] = {str(k): int(v) for k, v in frame[column].value_counts().items() if v}
+    for column in ("year_built", "stories", "total_value"):
+        quantiles = frame[column].astype("float64").quantile([0.0, 0.25, 0.5, 0.75, 1.0])
+        distributions[column] = {f"p{int(q * 100)}": _jsonable(v) for q, v in quantiles.items()}
+
+    # HPD class A + B units where known, otherwise the portal's residential unit count
+    units = frame["a_units"].astype("float64").fillna(0) + frame["b_units"].astype("float64").fillna(0)
+    units = units.where(units > 0, frame["residential_units"].astype("float64"))
+    units = units.where(units > 0)
+    stories = frame["stories"].astype("float64")
+    stories = stories.where(stories > 0)
+    open_violations = frame[["a_violations", "b_violations", "c_violations", "i_violations"]].astype("float64").sum(axis=1, min_count=1)
+
+    rankings = {
+        "c_violations_per_unit": _ranking(frame, frame["c_violations"].astype("float64") / units, top),
+        "hpd_violations_per_unit": _ranking(frame, open_violations / units, top),
+        "assessed_value_per_story": _ranking(frame, frame["total_value"] / stories, top),
+        "assessed_value_per_unit": _ranking(frame, frame["total_value"] / units, top),
+        "open_dob_ecb_violations": _ranking(
+            frame, frame[["dob_violations_open", "ecb_violations_open"]].astype("float64").sum(axis=1, min_count=1), top
+        ),
+    }
+    return {"totals": totals, "distributions": distributions, "rankings": rankings}
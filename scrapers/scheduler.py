@@ -0,0 +1,95 @@
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+from .metrics import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+
+class Scheduler:
+    """Admits source scrapes into a fixed number of browser slots by priority class.
+
+    Interactive scrapes are admitted first whenever a slot is free, and
+    reserved_interactive slots are never handed to batch work, so a user
+    clicking Scrape does not queue behind a portfolio refresh. Within a class,
+    waiters are admitted in arrival order.
+    """
+
+    def __init__(self, capacity=4, reserved_interactive=1):
+        if not 0 <= reserved_interactive < capacity:
+            raise ValueError("reserved_interactive must be at least 0 and less than capacity")
+        self.capacity = capacity
+        self.reserved_interactive = reserved_interactive
+        self._cond = threading.Condition()
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+
+    def _can_run(self, priority, ticket):
+        if self._waiting[priority][0] is not ticket:
+            return False
+        if sum(self._running.values()) >= self.capacity:
+            return False
+        if priority == BATCH:
+            # Batch only gets the unreserved slots, and only when no interactive work is waiting
+            if self._waiting[INTERACTIVE]:
+                return False
+            return self._running[BATCH] < self.capacity - self.reserved_interactive
+        return True
+
+    def _publish(self, priority):
+        metrics.set_gauge(f"scheduler.{priority}.queue_depth", len(self._waiting[priority]))
+        metrics.set_gauge(f"scheduler.{priority}.running", self._running[priority])
+
+    def try_acquire(self, priority=INTERACTIVE):
+        """Take a slot only if one is free right now with nobody of the class waiting; pair with release"""
+        with self._cond:
+            if self._waiting[priority] or sum(self._running.values()) >= self.capacity:
+                return False
+            if priority == BATCH and (
+                self._waiting[INTERACTIVE] or self._running[BATCH] >= self.capacity - self.reserved_interactive
+            ):
+                return False
+            self._running[priority] += 1
+            self._publish(priority)
+            return True
+
+    def release(self, priority=INTERACTIVE):
+        with self._cond:
+            self._running[priority] -= 1
+            self._publish(priority)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        """Hold one browser slot for the duration of the block"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        ticket = object()
+        start = time.time()
+        with self._cond:
+            self._waiting[priority].append(ticket)
+            self._publish(priority)
+            while not self._can_run(priority, ticket):
+                self._cond.wait()
+            self._waiting[priority].popleft()
+            self._running[priority] += 1
+            self._publish(priority)
+            # Admission may let the next waiter of either class run too
+            self._cond.notify_all()
+        metrics.observe(f"scheduler.{priority}.wait_seconds", round(time.time() - start, 3))
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "reserved_interactive": self.reserved_interactive,
+                "running": dict(self._running),
+                "waiting": {priority: len(queue) for priority, queue in self._waiting.items()},
+            }
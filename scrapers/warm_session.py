@@ -0,0 +1,155 @@
+import queue
+import time
+import traceback
+from abc import ABC, abstractmethod
+from .metrics import metrics
+
+
+class WarmSearchMixin(ABC):
+    """Search-form hooks for scrapers whose lookups can run in warm sessions.
+
+    Mix in ahead of BaseScraper; enable_warm_sessions is refused by scrapers without it.
+    """
+
+    def enable_warm_sessions(self, size=2, **session_options):
+        """Serve lookups from resident browsers kept on the site's search page"""
+        self.warm_sessions = WarmSessionPool(self, size, **session_options)
+
+    @abstractmethod
+    def _open_search(self, driver, wait):
+        """Load the site's search page"""
+
+    @abstractmethod
+    def _search_ready(self, driver):
+        """True when the search form is ready for input"""
+
+    @abstractmethod
+    def _reset_search(self, driver, wait):
+        """Return to the search form without a full reload"""
+
+    @abstractmethod
+    def _search(self, driver, wait, *args):
+        """Submit one lookup on the ready search form and scrape the results"""
+
+    def _cold_search(self, *args):
+        """Run one lookup in a fresh browser that is quit afterwards"""
+        driver, wait = self._setup_driver()
+        try:
+            self._open_search(driver, wait)
+            return self._search(driver, wait, *args)
+        finally:
+            self._quit_driver(driver)
+
+
+class WarmSession:
+    """One resident browser kept on a site's search app between lookups.
+
+    The scraper supplies the site specifics through _open_search (full load),
+    _search_ready, _search (submit and scrape) and _reset_search (back to the
+    form without reloading the app). The reset happens at the start of the next
+    lookup, so it never delays the result of the current one. A session that is
+    stale, broken or past its use/age limits is re-warmed with a fresh browser.
+    """
+
+    def __init__(self, scraper, max_uses=200, max_age_seconds=1800):
+        self.scraper = scraper
+        self.max_uses = max_uses
+        self.max_age_seconds = max_age_seconds
+        self.driver = None
+        self.wait = None
+        self.warmed_at = 0
+        self.uses = 0
+
+    def _site(self):
+        return self.scraper.__class__.__name__
+
+    def close(self):
+        if self.driver:
+            self.scraper._quit_driver(self.driver)
+        self.driver = None
+
+    def warm(self):
+        """Start a fresh resident browser and load the search page"""
+        self.close()
+        print(f"🔥 Warming {self._site()} search session...")
+        self.driver, self.wait = self.scraper._setup_driver(resident=True)
+        self.scraper._open_search(self.driver, self.wait)
+        self.warmed_at = time.time()
+        self.uses = 0
+        metrics.incr(f"warm_sessions.{self._site()}.warmed")
+
+    def _ensure_ready(self):
+        """Make sure the search form is up, resetting or re-warming as needed"""
+        if (
+            self.driver is None
+            or self.uses >= self.max_uses
+            or time.time() - self.warmed_at > self.max_age_seconds
+        ):
+            self.warm()
+            return
+        try:
+            if not self.scraper._search_ready(self.driver):
+                self.scraper._reset_search(self.driver, self.wait)
+        except Exception as e:
+            print(f"  ⚠️ {self._site()} session went stale ({e}), re-warming")
+            self.warm()
+
+    def lookup(self, *args):
+        """Run one search in this session, re-warming and retrying once on failure"""
+        for attempt in (1, 2):
+            try:
+                self._ensure_ready()
+                self.uses += 1
+                result = self.scraper._search(self.driver, self.wait, *args)
+                metrics.incr(f"warm_sessions.{self._site()}.lookups")
+                break
+            except Exception as e:
+                metrics.incr(f"warm_sessions.{self._site()}.errors")
+                # The browser state is unknown now; start over with a fresh one
+                self.close()
+                if attempt == 2:
+                    error_details = traceback.format_exc()
+                    print(f"Full error traceback:\n{error_details}")
+                    raise Exception(f"Error scraping {self._site()} data: {str(e)}\nFull traceback: {error_details}")
+                print(f"  ⚠️ {self._site()} warm lookup failed ({e}), retrying in a fresh session")
+        # The session stays on the results page; the next lookup resets it in _ensure_ready
+        return result
+
+
+class WarmSessionPool:
+    """A fixed number of warm sessions for one scraper.
+
+    A lookup waits up to wait_seconds for a free session. Callers hold a
+    scheduler slot while they wait, so after that it runs in a fresh browser
+    instead of queueing behind the busy sessions.
+    """
+
+    def __init__(self, scraper, size=2, wait_seconds=5, **session_options):
+        self.scraper = scraper
+        self.wait_seconds = wait_seconds
+        self._idle = queue.Queue()
+        self._sessions = [WarmSession(scraper, **session_options) for _ in range(size)]
+        for session in self._sessions:
+            self._idle.put(session)
+
+    def lookup(self, *args):
+        try:
+            session = self._idle.get(timeout=self.wait_seconds)
+        except queue.Empty:
+            site = self.scraper.__class__.__name__
+            print(f"  ⚠️ No warm {site} session free after {self.wait_seconds}s, using a fresh browser")
+            metrics.incr(f"warm_sessions.{site}.cold_fallbacks")
+            return self.scraper._cold_search(*args)
+        try:
+            return session.lookup(*args)
+        finally:
+            self._idle.put(session)
+
+    def close(self):
+        """Quit every idle session's browser"""
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()